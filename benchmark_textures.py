@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Texture Generation Benchmark Suite
+Times every TextureType x Quality combination stage by stage, records peak
+memory, compares against a stored baseline and load-tests the HTTP service
+
+Usage:
+    python3 benchmark_textures.py --output results.json
+    python3 benchmark_textures.py --baseline results.json --threshold 0.2
+    python3 benchmark_textures.py --no-stages --load-test --concurrency 32
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import __version__ as pillow_version
+from aiohttp.test_utils import TestClient, TestServer
+
+import texture_generation_service as service
+from texture_generation_service import (
+    AdvancedTextureGenerator,
+    GenerationExecutor,
+    Quality,
+    StageTimer,
+    TextureConfig,
+    TextureService,
+    TextureType,
+)
+
+logger = logging.getLogger('benchmark')
+
+# Auxiliary map combinations benchmarked for every type and quality
+MAP_SETS = {
+    'none': {},
+    'normal': {'enable_normal_map': True},
+    'specular': {'enable_specular': True},
+    'ao': {'enable_ao': True},
+    'all': {'enable_normal_map': True, 'enable_specular': True, 'enable_ao': True},
+}
+
+# Memory changes smaller than this are treated as noise when comparing to a baseline
+MIN_DELTA_KIB = 256
+
+
+class ProfilingTimer(StageTimer):
+    """StageTimer that also records the peak memory traced during each stage"""
+
+    def __init__(self):
+        super().__init__()
+        self.peak_bytes: Dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        with super().stage(name):
+            yield
+        peak = tracemalloc.get_traced_memory()[1] - before
+        self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), peak)
+
+
+def clear_render_caches():
+    """Drop memoized noise fields and lattices so every run pays full cost"""
+    for value in vars(service).values():
+        if callable(getattr(value, 'cache_clear', None)):
+            value.cache_clear()
+
+
+def benchmark_case(generator: AdvancedTextureGenerator, config: TextureConfig,
+                   repeat: int, warm: bool) -> Dict[str, Any]:
+    """Time each pipeline stage over ``repeat`` runs, then trace peak memory once"""
+    runs: List[Dict[str, float]] = []
+    for _ in range(repeat):
+        if not warm:
+            clear_render_caches()
+        timer = StageTimer()
+        generator._render_frames(config, 0, config.animation_frames, timer=timer)
+        runs.append(timer.seconds)
+
+    # Tracing slows allocation-heavy code, so memory gets a separate pass
+    if not warm:
+        clear_render_caches()
+    profiler = ProfilingTimer()
+    tracemalloc.start()
+    try:
+        generator._render_frames(config, 0, config.animation_frames, timer=profiler)
+    finally:
+        tracemalloc.stop()
+
+    stages = {}
+    for name in runs[0]:
+        samples = [run[name] * 1000 for run in runs]
+        stages[name] = {
+            'median_ms': round(statistics.median(samples), 3),
+            'min_ms': round(min(samples), 3),
+            'peak_kib': round(profiler.peak_bytes.get(name, 0) / 1024, 1),
+        }
+    return {
+        'stages': stages,
+        'total_ms': round(sum(stage['median_ms'] for stage in stages.values()), 3),
+    }
+
+
+def run_stage_benchmarks(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    generator = AdvancedTextureGenerator(
+        cache_dir=None,
+        executor=GenerationExecutor(max_workers=0)
+    )
+    # One-off costs such as PIL plugin setup shouldn't land on the first case
+    generator._render_frames(TextureConfig(texture_type='wall', width=8, height=8), 0, 1)
+
+    cases = []
+    for texture_type in args.types:
+        for quality in args.qualities:
+            size = Quality[quality].value
+            for map_set in args.map_sets:
+                config = TextureConfig(
+                    texture_type=texture_type,
+                    width=size,
+                    height=size,
+                    quality=quality,
+                    animation_frames=args.frames,
+                    seed=1,
+                    **MAP_SETS[map_set]
+                )
+                name = f"{texture_type}/{quality}/{map_set}"
+                case = {'name': name, 'size': size, 'frames': args.frames}
+                case.update(benchmark_case(generator, config, args.repeat, args.warm))
+                cases.append(case)
+                logger.info(f"{name:<28} {case['total_ms']:>10.1f} ms  " + '  '.join(
+                    f"{stage}={stats['median_ms']:.1f}" for stage, stats in case['stages'].items()
+                ))
+    return cases
+
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    """Drive TextureService through aiohttp's test client at a fixed concurrency"""
+    types = args.types
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        texture_service = TextureService(
+            cache_dir=cache_dir,
+            max_workers=args.workers,
+            queue_timeout=None
+        )
+        async with TestClient(TestServer(texture_service.app)) as client:
+            limit = asyncio.Semaphore(args.concurrency)
+
+            async def request(idx: int):
+                # A bounded set of distinct configs mixes cache hits with misses
+                variant = idx % args.distinct
+                payload = {
+                    'texture_type': types[variant % len(types)],
+                    'width': args.load_size,
+                    'height': args.load_size,
+                    'seed': variant,
+                    'animation_frames': args.frames,
+                }
+                async with limit:
+                    started = time.perf_counter()
+                    async with client.post('/api/generate', json=payload) as response:
+                        await response.read()
+                        statuses[response.status] += 1
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*[request(idx) for idx in range(args.requests)])
+            elapsed = time.perf_counter() - started
+            stats_response = await client.get('/api/stats')
+            service_stats = await stats_response.json()
+
+    percentiles = np.percentile(latencies, [50, 95, 99]) if latencies else [0, 0, 0]
+    return {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'workers': args.workers,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(args.requests / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(float(percentiles[0]), 3),
+            'p95': round(float(percentiles[1]), 3),
+            'p99': round(float(percentiles[2]), 3),
+            'max': round(max(latencies, default=0.0), 3),
+        },
+        'statuses': {str(status): count for status, count in statuses.items()},
+        'service_stats': service_stats,
+    }
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any],
+                        threshold: float, min_delta_ms: float) -> List[str]:
+    """Describe every stage or load metric that got worse by more than ``threshold``"""
+    regressions = []
+
+    def check(label: str, old: float, new: float, min_delta: float, unit: str):
+        if new - old > min_delta and new > old * (1 + threshold):
+            regressions.append(f"{label}: {old:.1f} -> {new:.1f} {unit} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+
+    previous = {case['name']: case for case in baseline.get('cases', [])}
+    for case in results.get('cases', []):
+        old_case = previous.get(case['name'])
+        if old_case is None:
+            continue
+        for stage, stats in case['stages'].items():
+            old_stats = old_case['stages'].get(stage)
+            if old_stats is None:
+                continue
+            check(f"{case['name']} {stage} time", old_stats['median_ms'], stats['median_ms'], min_delta_ms, 'ms')
+            check(f"{case['name']} {stage} memory", old_stats['peak_kib'], stats['peak_kib'], MIN_DELTA_KIB, 'KiB')
+
+    load, old_load = results.get('load'), baseline.get('load')
+    if load and old_load:
+        check('load p95 latency', old_load['latency_ms']['p95'], load['latency_ms']['p95'], min_delta_ms, 'ms')
+        # Lower throughput is the regression, so compare inverted
+        if load['throughput_rps'] < old_load['throughput_rps'] / (1 + threshold):
+            regressions.append(
+                f"load throughput: {old_load['throughput_rps']:.1f} -> {load['throughput_rps']:.1f} req/s"
+            )
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    def csv(choices: List[str]):
+        def parse(value: str) -> List[str]:
+            items = [item.strip() for item in value.split(',') if item.strip()]
+            unknown = [item for item in items if item not in choices]
+            if unknown:
+                raise argparse.ArgumentTypeError(f"unknown value(s): {', '.join(unknown)}")
+            return items
+        return parse
+
+    type_names = [t.value for t in TextureType]
+    quality_names = [q.name for q in Quality]
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--types', type=csv(type_names), default=type_names)
+    parser.add_argument('--qualities', type=csv(quality_names), default=quality_names)
+    parser.add_argument('--map-sets', type=csv(list(MAP_SETS)), default=['none', 'all'])
+    parser.add_argument('--frames', type=int, default=1, help='animation frames per texture')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per case (median is reported)')
+    parser.add_argument('--warm', action='store_true', help='keep noise/lattice caches between runs')
+    parser.add_argument('--no-stages', action='store_true', help='skip the per-stage matrix')
+    parser.add_argument('--output', help='write machine-readable results to this JSON file')
+    parser.add_argument('--baseline', help='fail if results regress against this results file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative regression (0.2 = 20%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0, help='ignore slowdowns smaller than this')
+
+    load = parser.add_argument_group('load test')
+    load.add_argument('--load-test', action='store_true', help='drive TextureService over HTTP')
+    load.add_argument('--concurrency', type=int, default=16)
+    load.add_argument('--requests', type=int, default=200)
+    load.add_argument('--distinct', type=int, default=16, help='distinct configs among the requests')
+    load.add_argument('--load-size', type=int, default=Quality.HIGH.value)
+    load.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # Per-request service logging would drown out the report
+    logging.getLogger('texture_generation_service').setLevel(logging.WARNING)
+    logging.getLogger('aiohttp.access').setLevel(logging.WARNING)
+
+    results: Dict[str, Any] = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pillow': pillow_version,
+            'repeat': args.repeat,
+            'warm': args.warm,
+        }
+    }
+
+    if not args.no_stages:
+        results['cases'] = run_stage_benchmarks(args)
+
+    if args.load_test:
+        results['load'] = asyncio.run(run_load_test(args))
+        load = results['load']
+        logger.info(
+            f"load: {load['throughput_rps']} req/s, p50 {load['latency_ms']['p50']} ms, "
+            f"p95 {load['latency_ms']['p95']} ms, statuses {load['statuses']}"
+        )
+
+    results['meta']['max_rss_kib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.threshold, args.min_delta_ms)
+        for regression in regressions:
+            logger.error(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        logger.info(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Same config, same bytes: regardless of workers, chunking and concurrency"""
+
+import asyncio
+from dataclasses import replace
+
+import pytest
+
+from texture_generation_service import (
+    AdvancedTextureGenerator,
+    GenerationExecutor,
+    TextureConfig,
+)
+
+
+CONFIGS = [
+    TextureConfig('wall', 64, 64, quality='LOW', enable_normal_map=True),
+    TextureConfig('sprite', 32, 32, quality='LOW', animation_frames=6),
+    TextureConfig('particle', 32, 32, quality='LOW', animation_frames=5),
+    TextureConfig('projectile', 32, 32, quality='LOW', animation_frames=3),
+]
+
+
+@pytest.fixture(params=[None, 1234], ids=['unseeded', 'seeded'])
+def seed(request):
+    return request.param
+
+
+@pytest.fixture(params=CONFIGS, ids=[config.texture_type for config in CONFIGS])
+def config(request, seed):
+    return replace(request.param, seed=seed)
+
+
+@pytest.fixture(scope='module')
+def pool():
+    executor = GenerationExecutor(max_workers=2, queue_timeout=None)
+    yield executor
+    executor.shutdown()
+
+
+def generate(config, executor):
+    generator = AdvancedTextureGenerator(cache_dir=None, executor=executor)
+    return asyncio.run(generator.generate(config)).maps
+
+
+def test_inline_matches_pool(config, pool):
+    inline = generate(config, GenerationExecutor(max_workers=0))
+    assert generate(config, pool) == inline
+
+
+def test_frame_chunks_in_any_order(config):
+    generator = AdvancedTextureGenerator(cache_dir=None, executor=GenerationExecutor(max_workers=0))
+    whole = generator._render_frames(config, 0, config.animation_frames)
+    
+    chunks = {}
+    for start in reversed(range(config.animation_frames)):
+        chunks[start] = generator._render_frames(config, start, start + 1)
+    frames = [frame for start in sorted(chunks) for frame in chunks[start]]
+    
+    assert frames == whole
+
+
+def test_concurrent_generate(config, pool):
+    expected = generate(config, GenerationExecutor(max_workers=0))
+    
+    async def run():
+        # Separate generators, so the requests aren't coalesced into one
+        generators = [AdvancedTextureGenerator(cache_dir=None, executor=pool) for _ in range(3)]
+        others = [replace(other, seed=config.seed) for other in CONFIGS if other.texture_type != config.texture_type]
+        results = await asyncio.gather(
+            *(generator.generate(config) for generator in generators),
+            *(generators[0].generate(other) for other in others)
+        )
+        return results[:len(generators)]
+    
+    for result in asyncio.run(run()):
+        assert result.maps == expected
@@ -4,36 +4,414 @@ AAA-Quality Texture & Sprite Generation Service
 Professional-grade procedural asset generation with caching, validation, and API
 """
 
+import argparse
 import asyncio
 import base64
+import contextlib
+import functools
 import hashlib
 import io
 import json
 import logging
+import mmap
+import multiprocessing
 import os
-from dataclasses import dataclass, asdict
+import re
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, asdict, fields, replace
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
-from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from datetime import datetime
 
 import numpy as np
-from PIL import Image, ImageDraw, ImageFilter, ImageEnhance
+from PIL import Image, ImageColor, ImageDraw, ImageFilter, ImageEnhance, features
 from aiohttp import web
-import aiofiles
 from functools import lru_cache
 
-# Configure professional logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('texture_service.log'),
-        logging.StreamHandler()
-    ]
-)
+try:
+    from prometheus_client import CollectorRegistry, Gauge, Histogram, generate_latest
+    from prometheus_client import CONTENT_TYPE_LATEST as METRICS_CONTENT_TYPE
+except ImportError:  # Optional: /metrics reports itself unavailable
+    CollectorRegistry = None
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib json module is used instead
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:  # Optional: asyncio's default event loop is used instead
+    uvloop = None
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows: pack caches aren't locked against other processes
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def configure_logging(log_file: Optional[str] = 'texture_service.log'):
+    """
+    Log INFO and above to stderr and ``log_file``
+    
+    Called by main rather than on import, so worker processes and tools
+    importing this module don't open a log file.
+    """
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file))
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, handlers=handlers)
+
+
+def install_uvloop() -> bool:
+    """Make new event loops uvloop's, if it is installed"""
+    if uvloop is None:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+# orjson options: metadata may hold numpy scalars
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """UTF-8 JSON of ``obj``, through orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # e.g. integers beyond 64 bits, which the stdlib handles
+            pass
+    return json.dumps(obj).encode('utf-8')
+
+
+# orjson parses integers beyond 64 bits (e.g. seeds) as floats, so any
+# document that might hold one is left to the stdlib
+_LONG_DIGITS = re.compile(rb'\d{19}')
+
+
+def _json_loads(data: bytes) -> Any:
+    """Parse UTF-8 JSON, through orjson when it is installed"""
+    if orjson is not None and _LONG_DIGITS.search(data) is None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_response(data: Any, status: int = 200,
+                   headers: Optional[Dict[str, str]] = None) -> web.Response:
+    """web.json_response, serialized with _json_dumps"""
+    return web.Response(body=_json_dumps(data), status=status, headers=headers,
+                        content_type='application/json')
+
+
+# Fixed-point precision used by PIL's alpha compositing
+_PRECISION_BITS = 7
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+def _array_cache(max_bytes: int) -> Callable[[Callable[..., np.ndarray]], Callable[..., np.ndarray]]:
+    """Like lru_cache for functions returning arrays, but bounded by their total size"""
+    def decorate(function: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+        entries: 'OrderedDict[tuple, np.ndarray]' = OrderedDict()
+        lock = threading.Lock()
+        
+        @functools.wraps(function)
+        def cached(*args, **kwargs) -> np.ndarray:
+            key = (args, tuple(sorted(kwargs.items())))
+            with lock:
+                if key in entries:
+                    entries.move_to_end(key)
+                    return entries[key]
+            result = function(*args, **kwargs)
+            if result.nbytes <= max_bytes:
+                with lock:
+                    entries[key] = result
+                    total = sum(array.nbytes for array in entries.values())
+                    while total > max_bytes:
+                        _, evicted = entries.popitem(last=False)
+                        total -= evicted.nbytes
+            return result
+        
+        cached.cache_clear = entries.clear
+        return cached
+    return decorate
+
+
+# Memory each process may spend on memoized noise fields; larger fields
+# are recomputed every time
+NOISE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+@lru_cache(maxsize=8)
+def _detail_mark_mask(size: int) -> np.ndarray:
+    """Pixel coverage of a detail mark ellipse, rasterized once per size"""
+    mark = Image.new('L', (size + 1, size + 1), 0)
+    ImageDraw.Draw(mark).ellipse([0, 0, size, size], fill=255)
+    mask = np.array(mark) > 0
+    mask.setflags(write=False)
+    return mask
+
+
+# Palette slots, in the order a custom color_palette lists them
+PALETTE_SLOTS = ('primary', 'secondary', 'accent', 'highlight')
+
+# Colour indices of theme-neutral bases: 0 is transparent black, then the
+# palette slots, then fixed colours that ignore the theme
+_SLOT_INDEX = {slot: idx for idx, slot in enumerate(PALETTE_SLOTS, 1)}
+_FIXED_COLORS = ((0, 0, 0), (255, 255, 255), (128, 128, 128))
+_BLACK, _WHITE, _GRAY = range(len(PALETTE_SLOTS) + 1, len(PALETTE_SLOTS) + 1 + len(_FIXED_COLORS))
+
+
+def _color_lut(palette: Dict[str, tuple]) -> np.ndarray:
+    """RGB of every colour index under ``palette``"""
+    colors = [(0, 0, 0)] + [palette[slot] for slot in PALETTE_SLOTS] + list(_FIXED_COLORS)
+    return np.array(colors, dtype=np.uint8)
+
+
+def _pack_base(base: Dict[str, np.ndarray]) -> bytes:
+    """Serialize a theme-neutral base for the cache"""
+    # Index and alpha planes are mostly flat, so they deflate to a fraction
+    # of the encoded frames
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **base)
+    return buffer.getvalue()
+
+
+def _unpack_base(data: bytes) -> Dict[str, np.ndarray]:
+    with np.load(io.BytesIO(data)) as arrays:
+        return {name: arrays[name] for name in arrays.files}
+
+
+# Sprite frames bounce vertically by at most this many pixels
+_SPRITE_BOUNCE = 5
+
+# Width in pixels of the soft edge on particle textures
+PARTICLE_SOFTNESS = 3.0
+
+
+@lru_cache(maxsize=16)
+def _sprite_static_layer(width: int, height: int) -> np.ndarray:
+    """
+    Colour indices of the sprite's body, head, eyes and pupils at rest
+    
+    The canvas is padded by the bounce range on both sides, so each frame
+    crops its window out of it instead of redrawing. It is 0 where empty
+    and returned read-only.
+    """
+    pad = _SPRITE_BOUNCE
+    color = _SLOT_INDEX['secondary']
+    img = Image.new('L', (width, height + 2 * pad), 0)
+    draw = ImageDraw.Draw(img)
+    
+    center_x, center_y = width // 2, height // 2 + pad
+    
+    # Body
+    body_radius = width // 3
+    draw.ellipse(
+        [center_x - body_radius, center_y - body_radius,
+         center_x + body_radius, center_y + body_radius],
+        fill=color
+    )
+    
+    # Head
+    head_radius = width // 4
+    head_y = center_y - body_radius // 2
+    draw.ellipse(
+        [center_x - head_radius, head_y - head_radius,
+         center_x + head_radius, head_y + head_radius],
+        fill=color
+    )
+    
+    # Eyes, then pupils
+    eye_size = width // 16
+    for size, fill in ((eye_size, _WHITE), (eye_size // 2, _BLACK)):
+        for eye_x in (center_x - head_radius // 2, center_x + head_radius // 2):
+            draw.ellipse(
+                [eye_x - size, head_y - size, eye_x + size, head_y + size],
+                fill=fill
+            )
+    
+    return _read_only(np.array(img))
+
+
+@lru_cache(maxsize=16)
+def _soft_shadow_layer(width: int, height: int) -> np.ndarray:
+    """
+    Alpha of the blurred black drop shadow behind sprites
+    
+    The shadow covers the whole canvas rather than following the sprite's
+    shape, so it only depends on the size. Returned read-only.
+    """
+    shadow = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    shadow.paste((0, 0, 0, 80), (0, 0, width, height))
+    shadow = shadow.filter(ImageFilter.GaussianBlur(radius=5))
+    
+    # Offset shadow
+    result = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    result.paste(shadow, (2, 2), shadow)
+    return _read_only(np.array(result.getchannel('A')))
+
+
+# Unit gradient directions for 2D gradient noise
+_GRADIENT_ANGLES = np.arange(16) * (2 * np.pi / 16)
+_GRADIENT_X = np.cos(_GRADIENT_ANGLES).astype(np.float32)
+_GRADIENT_Y = np.sin(_GRADIENT_ANGLES).astype(np.float32)
+
+
+@lru_cache(maxsize=64)
+def _permutation_table(seed: int, octave: int) -> np.ndarray:
+    """Seeded permutation of lattice hashes for one noise octave"""
+    rng = np.random.default_rng([seed % 2**64, octave])
+    return _read_only(rng.permutation(256).astype(np.uint16))
+
+
+@lru_cache(maxsize=128)
+def _noise_axis(length: int, cells: float, period: Optional[int]) -> Tuple[np.ndarray, ...]:
+    """Lattice indices, offsets and fade weights of every pixel along one axis"""
+    coords = np.arange(length) * (cells / length)
+    lower = np.floor(coords).astype(np.int64)
+    offset = (coords - lower).astype(np.float32)
+    upper = lower + 1
+    if period is not None:
+        lower %= period
+        upper %= period
+    fade = offset ** 3 * (offset * (offset * 6 - 15) + 10)
+    lower, upper = (lower & 255).astype(np.uint16), (upper & 255).astype(np.uint16)
+    return tuple(_read_only(a) for a in (lower, upper, offset, fade))
+
+
+def gradient_noise(width: int, height: int, cells_x: float, cells_y: float,
+                   seed: int = 0, octave: int = 0, tileable: bool = False,
+                   window: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+    """
+    One octave of 2D gradient (Perlin) noise, roughly in [-1, 1]
+    
+    ``cells_x``/``cells_y`` give the number of lattice cells across the
+    image. When ``tileable`` they must be whole numbers, and the lattice
+    wraps so the image tiles seamlessly. ``window`` (left, top, right,
+    bottom) renders only that part of the image.
+    """
+    left, top, right, bottom = window or (0, 0, width, height)
+    perm = _permutation_table(seed, octave)
+    x0, x1, fx, u = (a[left:right] for a in _noise_axis(width, cells_x, int(cells_x) if tileable else None))
+    y0, y1, fy, v = (a[top:bottom] for a in _noise_axis(height, cells_y, int(cells_y) if tileable else None))
+    
+    # Axes are separable, so only the corner hashes need full-size arrays
+    def corner(px: np.ndarray, yi: np.ndarray, dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+        hashed = px[np.newaxis, :] + yi[:, np.newaxis]
+        hashed &= 255
+        gradient = gradients[hashed]
+        dot = _GRADIENT_X[gradient]
+        dot *= dx[np.newaxis, :]
+        along_y = _GRADIENT_Y[gradient]
+        along_y *= dy[:, np.newaxis]
+        dot += along_y
+        return dot
+    
+    gradients = (perm & 15).astype(np.uint8)
+    px0, px1 = perm[x0], perm[x1]
+    top = corner(px0, y0, fx, fy)
+    top += u * (corner(px1, y0, fx - 1, fy) - top)
+    bottom = corner(px0, y1, fx, fy - 1)
+    bottom += u * (corner(px1, y1, fx - 1, fy - 1) - bottom)
+    top += v[:, np.newaxis] * (bottom - top)
+    top *= np.float32(np.sqrt(2))
+    return top
+
+
+@_array_cache(NOISE_CACHE_BYTES)
+def fractal_noise(width: int, height: int, scale: float = 0.1, seed: int = 0,
+                  octaves: int = 4, lacunarity: float = 2.0, gain: float = 0.5,
+                  tileable: bool = True) -> np.ndarray:
+    """
+    Fractal Brownian motion of gradient noise, normalized to [0, 1]
+    
+    ``scale`` is the number of lattice cells per pixel of the first octave;
+    each following octave multiplies it by ``lacunarity`` and its amplitude
+    by ``gain``. Results are cached up to NOISE_CACHE_BYTES and returned
+    read-only.
+    """
+    noise = fractal_noise_window(width, height, scale, seed, octaves, lacunarity, gain, tileable)
+    
+    # Normalize to 0-1
+    low, high = noise.min(), noise.max()
+    if high > low:
+        noise = (noise - low) / (high - low)
+    else:
+        noise[:] = 0.5
+    return _read_only(noise)
+
+
+def fractal_noise_window(width: int, height: int, scale: float = 0.1, seed: int = 0,
+                         octaves: int = 4, lacunarity: float = 2.0, gain: float = 0.5,
+                         tileable: bool = True,
+                         window: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
+    """
+    Un-normalized fractal noise over ``window`` of a ``width`` x ``height`` image
+    
+    Every window agrees with the same pixels of the whole image, so tiles
+    can be rendered separately and normalized by the global range later.
+    """
+    left, top, right, bottom = window or (0, 0, width, height)
+    noise = np.zeros((bottom - top, right - left), dtype=np.float32)
+    amplitude = 1.0
+    for octave in range(octaves):
+        cells_x = width * scale * lacunarity ** octave
+        cells_y = height * scale * lacunarity ** octave
+        if tileable:
+            # Whole cells per side keep every octave periodic over the image
+            cells_x, cells_y = max(1, round(cells_x)), max(1, round(cells_y))
+        noise += amplitude * gradient_noise(width, height, cells_x, cells_y, seed, octave, tileable, window)
+        amplitude *= gain
+    return noise
+
+
+@lru_cache(maxsize=16)
+def _radial_distance(width: int, height: int, cx: int, cy: int) -> np.ndarray:
+    """Distance of every pixel from (cx, cy), shared by all frames of a size"""
+    dy = np.arange(height, dtype=np.float32) - cy
+    dx = np.arange(width, dtype=np.float32) - cx
+    return _read_only(np.sqrt(dy[:, np.newaxis] ** 2 + dx[np.newaxis, :] ** 2))
+
+
+def _pixel_noise(seed: int, frame: int, window: Tuple[int, int, int, int], image_width: int,
+                 low: int, high: int, channels: int = 3) -> np.ndarray:
+    """
+    Uniform integers in [low, high) hashed from each pixel's position
+    
+    Unlike a sequential generator stream, any window can be rendered on
+    its own and agrees with its neighbours (splitmix64 over the pixel index).
+    """
+    left, top, right, bottom = window
+    rows = np.arange(top, bottom, dtype=np.uint64)[:, np.newaxis, np.newaxis]
+    cols = np.arange(left, right, dtype=np.uint64)[np.newaxis, :, np.newaxis]
+    z = (rows * np.uint64(image_width) + cols) * np.uint64(channels) + np.arange(channels, dtype=np.uint64)
+    z += np.uint64((seed * 0x9E3779B97F4A7C15 + frame + 1) * 0x9E3779B97F4A7C15 % 2**64)
+    z ^= z >> np.uint64(30)
+    z *= np.uint64(0xBF58476D1CE4E5B9)
+    z ^= z >> np.uint64(27)
+    z *= np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return (z % np.uint64(high - low)).astype(np.int16) + np.int16(low)
+
 
 class TextureType(Enum):
     """Supported texture types"""
@@ -56,6 +434,18 @@ class Quality(Enum):
     AAA = 1024
 
 
+_TEXTURE_TYPES = {texture_type.value for texture_type in TextureType}
+
+# Bump whenever the same config would render different output, so ETags
+# handed out for the old output stop matching
+GENERATOR_VERSION = '4'
+
+
+def _is_current(result: 'TextureResult') -> bool:
+    """Whether a cached result was produced by this generator version"""
+    return result.metadata.get('generator_version') == GENERATOR_VERSION
+
+
 @dataclass
 class TextureConfig:
     """Configuration for texture generation"""
@@ -70,181 +460,2631 @@ class TextureConfig:
     enable_normal_map: bool = False
     enable_specular: bool = False
     enable_ao: bool = False  # Ambient occlusion
-    compression: str = "png"
+    compression: str = "png"  # See parse_compression
+    atlas: bool = False  # Pack all frames into one sheet per map
+    atlas_padding: int = 1
+    mipmaps: bool = False  # Also return the downsampled chain down to 1x1
+    tile_size: Optional[int] = None  # Render walls as tiles of this size (see _generate_tiles)
     
     def to_cache_key(self) -> str:
         """Generate unique cache key"""
+        return self.cache_key
+    
+    @functools.cached_property
+    def cache_key(self) -> str:
+        """
+        Cache key, computed once per config
+        
+        Configs are treated as immutable once built; derive variants with
+        dataclasses.replace, which starts without a cached key.
+        """
         config_str = json.dumps(asdict(self), sort_keys=True)
         return hashlib.sha256(config_str.encode()).hexdigest()
+    
+    @classmethod
+    def from_query(cls, query: Dict[str, str]) -> 'TextureConfig':
+        """
+        Build a config from URL query parameters
+        
+        Parameters that aren't config fields are ignored. Booleans accept
+        1/true/yes/on, and color_palette is a JSON list or comma-separated.
+        """
+        values: Dict[str, Any] = {}
+        for field in fields(cls):
+            if field.name not in query:
+                continue
+            raw = query[field.name]
+            if field.type is bool:
+                values[field.name] = raw.lower() in ('1', 'true', 'yes', 'on')
+            elif field.type in (int, Optional[int]):
+                values[field.name] = int(raw)
+            elif field.type == Optional[List[str]]:
+                values[field.name] = json.loads(raw) if raw.startswith('[') else raw.split(',')
+            else:
+                values[field.name] = raw
+        return cls(**values)
+    
+    def to_query(self) -> Dict[str, str]:
+        """Query parameters that from_query turns back into this config"""
+        query = {}
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if value == field.default:
+                continue
+            if isinstance(value, bool):
+                query[field.name] = 'true' if value else 'false'
+            elif isinstance(value, list):
+                query[field.name] = json.dumps(value)
+            else:
+                query[field.name] = str(value)
+        return query
 
 
-class AdvancedTextureGenerator:
-    """Professional texture generation with advanced algorithms"""
+@dataclass
+class TextureResult:
+    """
+    Generated texture: encoded frames for each map plus metadata
     
-    def __init__(self, cache_dir: str = "./texture_cache"):
-        self.cache_dir = Path(cache_dir)
-        self.cache_dir.mkdir(exist_ok=True)
-        self.stats = {
-            'generated': 0,
-            'cached': 0,
-            'errors': 0
+    Frames served from the pack cache are memoryviews rather than bytes.
+    """
+    maps: Dict[str, List[bytes]]
+    metadata: Dict[str, Any]
+    
+    @property
+    def nbytes(self) -> int:
+        """Total size of all encoded frames"""
+        return sum(len(frame) for frames in self.maps.values() for frame in frames)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready form with base64-encoded frames"""
+        result = {
+            name: [base64.b64encode(frame).decode('utf-8') for frame in frames]
+            for name, frames in self.maps.items()
         }
+        result['metadata'] = self.metadata
+        return result
+
+
+# Fields that only matter after recolouring, so bases are shared across them
+_BASE_NEUTRAL = {
+    field.name: field.default for field in fields(TextureConfig)
+    if field.name in ('theme', 'color_palette', 'quality', 'enable_normal_map', 'enable_specular',
+                      'enable_ao', 'compression', 'atlas', 'atlas_padding', 'mipmaps', 'tile_size')
+}
+
+
+# Output encodings selectable through TextureConfig.compression
+@dataclass(frozen=True)
+class _Encoding:
+    name: str
+    format: str  # PIL format, or RAW for the uncompressed container
+    params: Tuple[Tuple[str, Any], ...]
+    content_type: str
+    extension: str
+
+
+# Uncompressed frames: this header, then width * height * 4 bytes of RGBA
+RAW_HEADER = struct.Struct('>4sII')
+RAW_MAGIC = b'RGBA'
+
+
+@lru_cache(maxsize=None)
+def parse_compression(value: str) -> _Encoding:
+    """
+    Resolve a ``compression`` setting
+    
+    png (zlib level 6), png:<0-9>, png-fast (level 1), webp (lossless),
+    webp-lossy (quality 80), webp:<1-100> (lossy at that quality), qoi, raw.
+    WebP falls back to PNG when Pillow is built without it. QOI needs a
+    Pillow that can write it.
+    """
+    kind, _, level = value.lower().partition(':')
+    if kind == 'png-fast':
+        kind, level = 'png', '1'
+    elif kind == 'webp-lossy':
+        kind, level = 'webp', '80'
+    
+    if kind == 'webp' and not features.check('webp'):
+        logger.warning(f"WebP support unavailable, encoding '{value}' as PNG")
+        kind, level = 'png', ''
+    if kind == 'qoi':
+        # Pillow reads QOI from 9.5 on but only writes it from 11.3
+        Image.init()
+        if 'QOI' not in Image.SAVE:
+            raise ValueError(f"Unsupported compression: {value} (this Pillow can't write QOI)")
+    
+    try:
+        if kind == 'png':
+            if level and not 0 <= int(level) <= 9:
+                raise ValueError
+            params = (('compress_level', int(level)),) if level else ()
+            return _Encoding('png', 'PNG', params, 'image/png', 'png')
+        if kind == 'webp':
+            if level and not 1 <= int(level) <= 100:
+                raise ValueError
+            params = (('lossless', False), ('quality', int(level))) if level else (('lossless', True),)
+            return _Encoding('webp', 'WEBP', params, 'image/webp', 'webp')
+        if kind == 'qoi' and not level:
+            return _Encoding('qoi', 'QOI', (), 'image/qoi', 'qoi')
+        if kind == 'raw' and not level:
+            return _Encoding('raw', 'RAW', (), 'application/x-raw-rgba', 'rgba')
+    except ValueError:
+        pass
+    raise ValueError(f"Unsupported compression: {value}")
+
+
+def _encode_image(img: Image.Image, encoding: _Encoding) -> bytes:
+    if encoding.format == 'RAW':
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
+        return RAW_HEADER.pack(RAW_MAGIC, img.width, img.height) + img.tobytes()
+    buffer = io.BytesIO()
+    img.save(buffer, format=encoding.format, **dict(encoding.params))
+    return buffer.getvalue()
+
+
+def _decode_image(data: bytes) -> Image.Image:
+    """Open an encoded frame in any of the output encodings"""
+    if bytes(data[:4]) == RAW_MAGIC:
+        _, width, height = RAW_HEADER.unpack_from(data)
+        return Image.frombytes('RGBA', (width, height), bytes(data[RAW_HEADER.size:]))
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img
+
+
+# Threads encoding the frames of one job; encoders release the GIL
+_encode_pool: Optional[ThreadPoolExecutor] = None
+_encode_threads: Optional[int] = None
+
+
+def _init_worker(workers: int):
+    """Split the cores between the encode pools of ``workers`` processes"""
+    global _encode_threads
+    _encode_threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _get_encode_pool() -> ThreadPoolExecutor:
+    global _encode_pool
+    if _encode_pool is None:
+        threads = _encode_threads or os.cpu_count() or 1
+        _encode_pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='encode')
+    return _encode_pool
+
+
+class MemoryTextureCache:
+    """
+    In-process LRU of texture results, bounded by total encoded bytes
+    
+    Entries older than ``ttl`` seconds count as misses and are dropped. An
+    entry's age runs from its ``created`` time, which tiers behind this one
+    pass along so copying an entry into memory doesn't extend its life.
+    """
+    
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[str, Tuple[TextureResult, float]]' = OrderedDict()
+    
+    def get(self, key: str) -> Optional[TextureResult]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        result, created = entry
+        if self.ttl is not None and time.time() - created > self.ttl:
+            del self._entries[key]
+            self.bytes -= result.nbytes
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return result
+    
+    def put(self, key: str, result: TextureResult, created: Optional[float] = None):
+        size = result.nbytes
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[0].nbytes
+        self._entries[key] = (result, time.time() if created is None else created)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+    
+    def discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[0].nbytes
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and (self.ttl is None or time.time() - entry[1] <= self.ttl)
+
+
+@dataclass
+class _DiskEntry:
+    """Bookkeeping for one entry in the disk cache index"""
+    size: int
+    created: float
+
+
+class _DiskCacheBase:
+    """
+    Index, TTL and LRU eviction shared by the disk tier backends
+    
+    Subclasses keep an in-memory index of entries, each with its
+    ``created`` time, in least recently used order. They build it on
+    first use in ``_load_index`` and drop entries in ``_remove_locked``,
+    which runs with ``_lock`` held. Least recently used entries are
+    evicted beyond ``max_bytes``, and entries older than ``ttl`` seconds
+    are treated as misses.
+    
+    Methods block on file I/O and are meant to run in a thread.
+    """
+    
+    def __init__(self, root: str, max_bytes: int, ttl: Optional[float]):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index: Optional[OrderedDict] = None
+    
+    def __len__(self) -> int:
+        return len(self._load_index())
+    
+    def __contains__(self, key: str) -> bool:
+        index = self._load_index()
+        with self._lock:
+            entry = index.get(key)
+            return entry is not None and not self._is_expired(entry)
+    
+    def created_at(self, key: str) -> Optional[float]:
+        """Write time of a live entry, for tiers in front of this one"""
+        index = self._load_index()
+        with self._lock:
+            entry = index.get(key)
+            return entry.created if entry is not None else None
+    
+    def discard(self, key: str):
+        self._load_index()
+        with self._lock:
+            self._remove_locked(key)
+    
+    def _is_expired(self, entry: Any) -> bool:
+        return self.ttl is not None and time.time() - entry.created > self.ttl
+    
+    def _evict_locked(self):
+        """Drop expired entries, then least recently used ones over the cap"""
+        index = self._index
+        for key in [key for key, entry in index.items() if self._is_expired(entry)]:
+            self._remove_locked(key)
+            self.evictions += 1
+        while self.bytes > self.max_bytes and index:
+            self._remove_locked(next(iter(index)))
+            self.evictions += 1
+    
+    def _remove_locked(self, key: str):
+        raise NotImplementedError
+    
+    def _load_index(self) -> OrderedDict:
+        raise NotImplementedError
+
+
+class DiskTextureCache(_DiskCacheBase):
+    """
+    Disk cache storing raw encoded frames, one directory per cache key
+    
+    Layout: ``<root>/<key[:2]>/<key>/manifest.json`` plus one file per
+    map frame. Entries are written into a temporary directory and renamed
+    into place, so concurrent writers never expose a partial entry.
+    """
+    
+    MANIFEST = 'manifest.json'
+    
+    def __init__(self, root: str, max_bytes: int = 4 * 1024 * 1024 * 1024,
+                 ttl: Optional[float] = None):
+        super().__init__(root, max_bytes, ttl)
+        self._tmp_dir = self.root / '.tmp'
+    
+    def get(self, key: str) -> Optional[TextureResult]:
+        index = self._load_index()
+        with self._lock:
+            entry = index.get(key)
+            if entry is None:
+                return None
+            if self._is_expired(entry):
+                self._remove_locked(key)
+                self.evictions += 1
+                return None
+            index.move_to_end(key)
         
-    async def generate(self, config: TextureConfig) -> Dict[str, Any]:
-        """
-        Generate texture with full validation and caching
-        
-        Returns:
-            Dict containing texture data, metadata, and optional maps
-        """
+        entry_dir = self._entry_dir(key)
         try:
-            cache_key = config.to_cache_key()
-            cached = await self._get_from_cache(cache_key)
-            
-            if cached:
-                self.stats['cached'] += 1
-                logger.info(f"Cache hit for {config.texture_type}")
-                return cached
-            
-            # Generate based on type
-            result = await self._generate_texture(config)
-            
-            # Save to cache
-            await self._save_to_cache(cache_key, result)
+            manifest = _json_loads((entry_dir / self.MANIFEST).read_bytes())
+            maps = {
+                name: [(entry_dir / filename).read_bytes() for filename in filenames]
+                for name, filenames in manifest['files'].items()
+            }
+            # Access time on the manifest orders the LRU across restarts
+            os.utime(entry_dir / self.MANIFEST)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Cache read error: {e}")
+            with self._lock:
+                self._remove_locked(key)
+            return None
+        return TextureResult(maps=maps, metadata=manifest['metadata'])
+    
+    def put(self, key: str, result: TextureResult):
+        index = self._load_index()
+        self._tmp_dir.mkdir(exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=self._tmp_dir))
+        try:
+            files = {}
+            for name, frames in result.maps.items():
+                files[name] = []
+                for idx, frame in enumerate(frames):
+                    # Frames may be in any output encoding (or bases), so no extension
+                    filename = f"{name}_{idx}"
+                    (staging / filename).write_bytes(frame)
+                    files[name].append(filename)
+            (staging / self.MANIFEST).write_bytes(_json_dumps({
+                'files': files,
+                'metadata': result.metadata
+            }))
             
-            self.stats['generated'] += 1
-            logger.info(f"Generated new {config.texture_type} texture")
+            entry_dir = self._entry_dir(key)
+            entry_dir.parent.mkdir(exist_ok=True)
+            with self._lock:
+                try:
+                    os.rename(staging, entry_dir)
+                except OSError:
+                    # Another writer (e.g. a bake) already stored this key;
+                    # adopt its entry so it is served and counted
+                    if key not in index:
+                        entry = self._scan_entry(entry_dir)
+                        if entry is not None:
+                            index[key] = entry
+                            self.bytes += entry.size
+                            self._evict_locked()
+                    return
+                size = result.nbytes
+                index[key] = _DiskEntry(size=size, created=time.time())
+                self.bytes += size
+                self._evict_locked()
+        except OSError as e:
+            logger.warning(f"Cache write error: {e}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    
+    def close(self):
+        """Nothing to flush: every entry is complete once renamed into place"""
+    
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+    
+    def _remove_locked(self, key: str):
+        entry = self._index.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        # Move the entry aside first so readers never see a half-deleted directory
+        self._tmp_dir.mkdir(exist_ok=True)
+        doomed = self._tmp_dir / f"evict-{key}-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.rename(self._entry_dir(key), doomed)
+        except OSError:
+            return
+        shutil.rmtree(doomed, ignore_errors=True)
+    
+    def _scan_entry(self, entry_dir: Path) -> Optional[_DiskEntry]:
+        """Bookkeeping for an entry directory on disk, or None if it is incomplete or gone"""
+        try:
+            # The directory keeps its write time; the manifest's mtime tracks access
+            created = entry_dir.stat().st_mtime
+            if not (entry_dir / self.MANIFEST).exists():
+                return None
+            size = sum(
+                path.stat().st_size for path in entry_dir.iterdir()
+                if path.name != self.MANIFEST
+            )
+        except OSError:
+            return None
+        return _DiskEntry(size=size, created=created)
+    
+    def _load_index(self) -> 'OrderedDict[str, _DiskEntry]':
+        """Scan the cache directory once, ordering entries by last access"""
+        with self._lock:
+            if self._index is not None:
+                return self._index
             
-            return result
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            found = []
+            for manifest in self.root.glob(f"??/*/{self.MANIFEST}"):
+                try:
+                    # Manifest mtime tracks last access
+                    accessed = manifest.stat().st_mtime
+                except OSError:
+                    continue
+                entry = self._scan_entry(manifest.parent)
+                if entry is not None:
+                    found.append((accessed, manifest.parent.name, entry))
             
-        except Exception as e:
-            self.stats['errors'] += 1
-            logger.error(f"Error generating texture: {e}", exc_info=True)
-            raise
+            self._index = OrderedDict()
+            for _, key, entry in sorted(found):
+                self._index[key] = entry
+                self.bytes += entry.size
+            self._evict_locked()
+            return self._index
+
+
+class CacheLockedError(RuntimeError):
+    """Raised when another process already holds a pack cache directory"""
+
+
+@dataclass
+class _PackEntry:
+    """Location of one live record in the pack cache"""
+    segment: int
+    offset: int
+    length: int
+    created: float
+    seq: int
+
+
+class PackTextureCache(_DiskCacheBase):
+    """
+    Disk cache storing entries as records appended to a few large segment files
     
-    async def _generate_texture(self, config: TextureConfig) -> Dict[str, Any]:
-        """Core generation logic"""
-        # Use seed for reproducibility
-        if config.seed:
-            np.random.seed(config.seed)
+    Each record holds a fixed header (sequence number, binary key, CRC), a
+    small JSON manifest and the encoded frames back to back. Reads slice the
+    frames out of an mmap of the segment, so hits are zero-copy memoryviews.
+    Removals append tombstones. Once dead records make up ``compact_ratio``
+    of the files, a background thread copies live records into a fresh
+    segment and deletes the old ones.
+    
+    The index lives in memory and is snapshotted to ``index.bin`` after
+    compaction and on close. At startup the snapshot is loaded and any
+    segment bytes written after it are replayed, with the highest sequence
+    number winning and torn records at a segment's tail truncated away.
+    
+    Only one process may use a pack cache at a time, since segments and
+    the snapshot assume a single writer. Opening one that another process
+    holds raises CacheLockedError.
+    
+    Keys must be hex SHA-256 digests.
+    """
+    
+    RECORD = struct.Struct('>4sQ32sBdIQI')  # magic, seq, key, kind, created, manifest, payload, crc
+    RECORD_MAGIC = b'TXR1'
+    INDEX_MAGIC = b'TXI1'
+    INDEX_HEADER = struct.Struct('>4sQII')  # magic, next seq, segments, entries
+    INDEX_SEGMENT = struct.Struct('>IQ')  # id, covered length
+    INDEX_ENTRY = struct.Struct('>32sIQQdQ')  # key, segment, offset, length, created, seq
+    INDEX_FILE = 'index.bin'
+    LOCK_FILE = '.lock'
+    PUT, DELETE = 0, 1
+    
+    def __init__(self, root: str, max_bytes: int = 4 * 1024 * 1024 * 1024,
+                 ttl: Optional[float] = None,
+                 segment_bytes: int = 256 * 1024 * 1024,
+                 compact_ratio: float = 0.5,
+                 compact_min_bytes: int = 64 * 1024 * 1024):
+        super().__init__(root, max_bytes, ttl)
+        self.segment_bytes = segment_bytes
+        self.compact_ratio = compact_ratio
+        self.compact_min_bytes = compact_min_bytes
+        self._lock_file = self._lock_root()
+        self.dead_bytes = 0
+        self.compactions = 0
+        self._segments: Dict[int, int] = {}  # id -> file size
+        self._maps: Dict[int, Any] = {}
+        self._next_seq = 0
+        self._next_segment = 0
+        self._active: Optional[int] = None
+        self._active_file = None
+        self._compactor: Optional[threading.Thread] = None
+    
+    def get(self, key: str) -> Optional[TextureResult]:
+        index = self._load_index()
+        with self._lock:
+            entry = index.get(key)
+            if entry is None:
+                return None
+            if self._is_expired(entry):
+                self._remove_locked(key)
+                self.evictions += 1
+                return None
+            index.move_to_end(key)
+            try:
+                record = self._view_locked(entry)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Cache read error: {e}")
+                self._remove_locked(key)
+                return None
         
-        # Select generation method
-        generator_map = {
-            "wall": self._generate_wall_texture,
-            "sprite": self._generate_sprite_texture,
-            "particle": self._generate_particle_texture,
-            "ui": self._generate_ui_texture,
-            "weapon": self._generate_weapon_texture,
-            "projectile": self._generate_projectile_texture,
-            "effect": self._generate_effect_texture,
-            "animated": self._generate_animated_texture
-        }
+        header = self.RECORD.unpack_from(record)
+        manifest_end = self.RECORD.size + header[5]
+        manifest = _json_loads(bytes(record[self.RECORD.size:manifest_end]))
+        maps = {}
+        offset = manifest_end
+        for name, lengths in manifest['frames'].items():
+            maps[name] = []
+            for length in lengths:
+                maps[name].append(record[offset:offset + length])
+                offset += length
+        return TextureResult(maps=maps, metadata=manifest['metadata'])
+    
+    def put(self, key: str, result: TextureResult):
+        self._load_index()
+        manifest = _json_dumps({
+            'frames': {name: [len(frame) for frame in frames] for name, frames in result.maps.items()},
+            'metadata': result.metadata
+        })
+        frames = [frame for frames in result.maps.values() for frame in frames]
         
-        generator = generator_map.get(config.texture_type, self._generate_default)
+        with self._lock:
+            try:
+                self._append_locked(key, self.PUT, [manifest] + frames, len(manifest))
+            except OSError as e:
+                logger.warning(f"Cache write error: {e}")
+                return
+            self._evict_locked()
+            self._maybe_compact_locked()
+    
+    def compact(self):
+        """Copy live records out of every sealed segment, then delete those segments"""
+        self._load_index()
+        with self._lock:
+            self._seal_locked()
+            sealed = set(self._segments)
+            live = [(key, entry) for key, entry in self._index.items() if entry.segment in sealed]
+            target = self._next_segment
+            self._next_segment += 1
+            views = [(key, entry, self._view_locked(entry)) for key, entry in live]
         
-        # Generate frames
-        frames = []
-        for frame_idx in range(config.animation_frames):
-            img = await generator(config, frame_idx)
-            
-            # Post-processing
-            img = await self._apply_post_processing(img, config)
-            
-            frames.append(img)
+        # Copying happens outside the lock; readers keep using the old segments
+        moved = []
+        offset = 0
+        with open(self._segment_path(target), 'wb') as f:
+            for key, entry, view in views:
+                f.write(view)
+                moved.append((key, entry, offset))
+                offset += entry.length
+            f.flush()
+            os.fsync(f.fileno())
         
-        # Build result
-        result = {
-            'diffuse': self._encode_images(frames),
-            'metadata': {
-                'width': config.width,
-                'height': config.height,
-                'frames': config.animation_frames,
-                'type': config.texture_type,
-                'timestamp': datetime.now().isoformat()
-            }
-        }
+        with self._lock:
+            self._segments[target] = offset
+            for key, entry, new_offset in moved:
+                # Entries rewritten or removed meanwhile leave a dead copy behind
+                if self._index.get(key) is entry:
+                    self._index[key] = replace(entry, segment=target, offset=new_offset)
+            for segment in sealed:
+                del self._segments[segment]
+                # Open memoryviews keep the mapping alive until they're released
+                self._maps.pop(segment, None)
+            self.dead_bytes = sum(self._segments.values()) - self.bytes
+            self._write_snapshot_locked()
+            for segment in sealed:
+                with contextlib.suppress(OSError):
+                    os.unlink(self._segment_path(segment))
+            self.compactions += 1
+    
+    def close(self):
+        """Wait for compaction and snapshot the index so the next start skips replay"""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        if self._index is not None:
+            with self._lock:
+                self._seal_locked()
+                self._write_snapshot_locked()
+        if self._lock_file is not None:
+            # Closing the file releases the lock
+            self._lock_file.close()
+            self._lock_file = None
+    
+    def _lock_root(self):
+        """Take the cache directory for this process, failing if another one has it"""
+        lock_file = open(self.root / self.LOCK_FILE, 'ab')
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise CacheLockedError(
+                f"Pack cache {self.root} is in use by another process; "
+                f"stop it first or use another cache directory"
+            )
+        return lock_file
+    
+    def _segment_path(self, segment: int) -> Path:
+        return self.root / f"{segment:08d}.pack"
+    
+    def _append_locked(self, key: str, kind: int, parts: List[bytes], manifest_length: int):
+        """Write one record to the active segment and apply it to the index"""
+        if self._active is None or self._segments[self._active] >= self.segment_bytes:
+            self._seal_locked()
+            self._active = self._next_segment
+            self._next_segment += 1
+            self._active_file = open(self._segment_path(self._active), 'ab')
+            self._segments[self._active] = 0
         
-        # Generate additional maps if requested
-        if config.enable_normal_map:
-            result['normal'] = self._encode_images([
-                await self._generate_normal_map(img) for img in frames
-            ])
+        crc = 0
+        for part in parts:
+            crc = zlib.crc32(part, crc)
+        payload_length = sum(len(part) for part in parts) - manifest_length
+        created = time.time()
+        seq = self._next_seq
+        self._next_seq += 1
+        header = self.RECORD.pack(
+            self.RECORD_MAGIC, seq, bytes.fromhex(key), kind,
+            created, manifest_length, payload_length, crc
+        )
         
-        if config.enable_specular:
-            result['specular'] = self._encode_images([
-                await self._generate_specular_map(img) for img in frames
-            ])
+        offset = self._segments[self._active]
+        self._active_file.write(header)
+        for part in parts:
+            self._active_file.write(part)
+        self._active_file.flush()
+        length = len(header) + manifest_length + payload_length
+        self._segments[self._active] += length
         
-        if config.enable_ao:
-            result['ao'] = self._encode_images([
-                await self._generate_ao_map(img) for img in frames
-            ])
+        entry = _PackEntry(segment=self._active, offset=offset, length=length, created=created, seq=seq)
+        self._apply_locked(key, kind, entry)
+    
+    def _apply_locked(self, key: str, kind: int, entry: _PackEntry):
+        previous = self._index.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous.length
+            self.dead_bytes += previous.length
+        if kind == self.PUT:
+            self._index[key] = entry
+            self.bytes += entry.length
+        else:
+            self.dead_bytes += entry.length
+    
+    def _remove_locked(self, key: str):
+        if key in self._index:
+            try:
+                self._append_locked(key, self.DELETE, [], 0)
+            except OSError as e:
+                logger.warning(f"Cache write error: {e}")
+                # Forget the entry anyway, or eviction would never get under
+                # the cap. Without its tombstone a replay may bring it back.
+                entry = self._index.pop(key)
+                self.bytes -= entry.length
+                self.dead_bytes += entry.length
+    
+    def _maybe_compact_locked(self):
+        total = sum(self._segments.values())
+        if (self.dead_bytes < self.compact_min_bytes or
+                self.dead_bytes < total * self.compact_ratio or
+                (self._compactor is not None and self._compactor.is_alive())):
+            return
+        self._compactor = threading.Thread(target=self._compact_in_background, daemon=True)
+        self._compactor.start()
+    
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.warning(f"Cache compaction failed: {e}")
+    
+    def _seal_locked(self):
+        """Stop appending to the active segment; the next write starts a new one"""
+        if self._active_file is not None:
+            self._active_file.close()
+            self._active_file = None
+        self._active = None
+    
+    def _view_locked(self, entry: _PackEntry) -> memoryview:
+        end = entry.offset + entry.length
+        mapped = self._maps.get(entry.segment)
+        if mapped is None or len(mapped) < end:
+            # Segments only grow, so remap when a record lies past the old mapping
+            with open(self._segment_path(entry.segment), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[entry.segment] = mapped
+        return memoryview(mapped)[entry.offset:end]
+    
+    def _write_snapshot_locked(self):
+        parts = [self.INDEX_HEADER.pack(
+            self.INDEX_MAGIC, self._next_seq, len(self._segments), len(self._index)
+        )]
+        parts += [self.INDEX_SEGMENT.pack(segment, size) for segment, size in self._segments.items()]
+        parts += [
+            self.INDEX_ENTRY.pack(bytes.fromhex(key), entry.segment, entry.offset,
+                                  entry.length, entry.created, entry.seq)
+            for key, entry in self._index.items()
+        ]
+        data = b''.join(parts)
+        tmp = self.root / f"{self.INDEX_FILE}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.write(struct.pack('>I', zlib.crc32(data)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.root / self.INDEX_FILE)
+    
+    def _read_snapshot(self) -> Optional[Tuple[int, Dict[int, int], 'OrderedDict[str, _PackEntry]']]:
+        try:
+            data = (self.root / self.INDEX_FILE).read_bytes()
+        except FileNotFoundError:
+            return None
+        if len(data) < self.INDEX_HEADER.size + 4 or \
+                struct.unpack('>I', data[-4:])[0] != zlib.crc32(data[:-4]):
+            logger.warning("Ignoring corrupt pack cache index; replaying segments")
+            return None
         
-        return result
+        magic, next_seq, segment_count, entry_count = self.INDEX_HEADER.unpack_from(data)
+        if magic != self.INDEX_MAGIC:
+            return None
+        offset = self.INDEX_HEADER.size
+        segments = {}
+        for segment, size in self.INDEX_SEGMENT.iter_unpack(
+                data[offset:offset + segment_count * self.INDEX_SEGMENT.size]):
+            segments[segment] = size
+        offset += segment_count * self.INDEX_SEGMENT.size
+        entries = OrderedDict()
+        for key, segment, entry_offset, length, created, seq in self.INDEX_ENTRY.iter_unpack(
+                data[offset:offset + entry_count * self.INDEX_ENTRY.size]):
+            entries[key.hex()] = _PackEntry(segment, entry_offset, length, created, seq)
+        return next_seq, segments, entries
+    
+    def _replay(self, segment: int, start: int, deleted: Dict[str, int]) -> int:
+        """Apply records from ``start`` onwards, truncating a torn tail; returns the valid size"""
+        path = self._segment_path(segment)
+        with open(path, 'r+b') as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = start
+            while offset + self.RECORD.size <= size:
+                f.seek(offset)
+                magic, seq, key, kind, created, manifest_length, payload_length, crc = \
+                    self.RECORD.unpack(f.read(self.RECORD.size))
+                length = self.RECORD.size + manifest_length + payload_length
+                if magic != self.RECORD_MAGIC or offset + length > size or \
+                        zlib.crc32(f.read(length - self.RECORD.size)) != crc:
+                    break
+                
+                key = key.hex()
+                self._next_seq = max(self._next_seq, seq + 1)
+                current = self._index.get(key)
+                if (current is None or current.seq < seq) and deleted.get(key, -1) < seq:
+                    if kind == self.DELETE:
+                        deleted[key] = seq
+                    self._apply_locked(key, kind, _PackEntry(segment, offset, length, created, seq))
+                offset += length
+            
+            if offset < size:
+                logger.warning(f"Truncating {size - offset} torn bytes from {path.name}")
+                f.truncate(offset)
+        return offset
+    
+    def _load_index(self) -> 'OrderedDict[str, _PackEntry]':
+        """Load the snapshot, then replay whatever was appended after it"""
+        with self._lock:
+            if self._index is not None:
+                return self._index
+            
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.root / f"{self.INDEX_FILE}.tmp")
+            on_disk = sorted(int(path.stem) for path in self.root.glob('*.pack') if path.stem.isdigit())
+            
+            snapshot = self._read_snapshot()
+            covered: Dict[int, int] = {}
+            self._index = OrderedDict()
+            if snapshot is not None:
+                self._next_seq, covered, entries = snapshot
+                present = set(on_disk)
+                for key, entry in entries.items():
+                    if entry.segment in present:
+                        self._index[key] = entry
+                        self.bytes += entry.length
+                # Segments older than the snapshot that it doesn't list were
+                # already compacted away before a crash
+                newest = max(covered, default=-1)
+                for segment in [s for s in on_disk if s <= newest and s not in covered]:
+                    os.unlink(self._segment_path(segment))
+                    on_disk.remove(segment)
+            
+            deleted: Dict[str, int] = {}
+            for segment in on_disk:
+                try:
+                    self._segments[segment] = self._replay(segment, covered.get(segment, 0), deleted)
+                except OSError as e:
+                    logger.warning(f"Skipping unreadable cache segment {segment}: {e}")
+            self._next_segment = max(on_disk, default=-1) + 1
+            self.dead_bytes = sum(self._segments.values()) - self.bytes
+            
+            self._evict_locked()
+            self._seal_locked()
+            self._write_snapshot_locked()
+            return self._index
+
+
+# Disk tier implementations selectable by name
+CACHE_BACKENDS = {
+    'dir': DiskTextureCache,
+    'pack': PackTextureCache
+}
+
+
+class TieredTextureCache:
+    """Memory LRU in front of the disk cache, with hit/miss/eviction counters"""
+    
+    def __init__(self, cache_dir: str,
+                 memory_bytes: int = 256 * 1024 * 1024,
+                 disk_bytes: int = 4 * 1024 * 1024 * 1024,
+                 ttl: Optional[float] = None,
+                 backend: str = 'dir'):
+        self.memory = MemoryTextureCache(max_bytes=memory_bytes, ttl=ttl)
+        self.disk = CACHE_BACKENDS[backend](cache_dir, max_bytes=disk_bytes, ttl=ttl)
+        self.counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0
+        }
+    
+    async def get(self, key: str,
+                  accept: Optional[Callable[[TextureResult], bool]] = None) -> Optional[TextureResult]:
+        """
+        Entry for ``key`` from the fastest tier holding it
+        
+        An entry that ``accept`` turns down is removed from both tiers, so a
+        new one can be stored in its place, and counts as a miss.
+        """
+        result = self.memory.get(key)
+        tier = 'memory'
+        if result is None:
+            result = await asyncio.to_thread(self.disk.get, key)
+            tier = 'disk'
+        
+        if result is not None and accept is not None and not accept(result):
+            await self.discard(key)
+            result = None
+        if result is None:
+            self.counters['misses'] += 1
+            return None
+        
+        self.counters[f'{tier}_hits'] += 1
+        if tier == 'disk':
+            self.memory.put(key, result, self.disk.created_at(key))
+        return result
+    
+    async def put(self, key: str, result: TextureResult):
+        self.memory.put(key, result)
+        await asyncio.to_thread(self.disk.put, key, result)
+    
+    async def discard(self, key: str):
+        self.memory.discard(key)
+        await asyncio.to_thread(self.disk.discard, key)
+    
+    def __contains__(self, key: str) -> bool:
+        """Whether either tier holds ``key``, without counting a hit or miss"""
+        return key in self.memory or key in self.disk
+    
+    async def contains(self, key: str) -> bool:
+        """``key in cache`` with the disk lookup off the event loop"""
+        return key in self.memory or await asyncio.to_thread(self.disk.__contains__, key)
+    
+    async def preload(self, keys: List[str]) -> int:
+        """Copy disk entries into memory until it is full, without counting hits"""
+        loaded = 0
+        for key in keys:
+            if self.memory.bytes >= self.memory.max_bytes:
+                break
+            result = await asyncio.to_thread(self.disk.get, key)
+            if result is not None:
+                self.memory.put(key, result, self.disk.created_at(key))
+                loaded += 1
+        return loaded
+    
+    async def close(self):
+        await asyncio.to_thread(self.disk.close)
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self.counters,
+            'memory_evictions': self.memory.evictions,
+            'disk_evictions': self.disk.evictions,
+            'memory_entries': len(self.memory),
+            'memory_bytes': self.memory.bytes,
+            'disk_bytes': self.disk.bytes
+        }
+
+
+# Largest sheet the packer will produce, per side
+MAX_ATLAS_SIZE = 8192
+
+
+class MaxRectsPacker:
+    """
+    MaxRects bin packer using the best-short-side-fit heuristic
+    
+    Rectangles are never rotated, since rotated frames would need
+    swizzled UVs on the client.
+    """
+    
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.free: List[Tuple[int, int, int, int]] = [(0, 0, width, height)]
+    
+    def insert(self, width: int, height: int) -> Optional[Tuple[int, int]]:
+        """Place a rectangle, returning its top-left corner or None if it doesn't fit"""
+        best = None
+        best_fit = (float('inf'), float('inf'))
+        for fx, fy, fw, fh in self.free:
+            if width <= fw and height <= fh:
+                leftover_x, leftover_y = fw - width, fh - height
+                fit = (min(leftover_x, leftover_y), max(leftover_x, leftover_y))
+                if fit < best_fit:
+                    best, best_fit = (fx, fy), fit
+        
+        if best is not None:
+            placed = (best[0], best[1], width, height)
+            split = []
+            for free in self.free:
+                split.extend(self._split(free, placed))
+            self.free = self._prune(split)
+        return best
+    
+    @staticmethod
+    def _split(free: Tuple[int, int, int, int],
+               placed: Tuple[int, int, int, int]) -> List[Tuple[int, int, int, int]]:
+        """Maximal free rectangles left in ``free`` after ``placed`` is used"""
+        fx, fy, fw, fh = free
+        x, y, w, h = placed
+        if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+            return [free]
+        
+        parts = []
+        if x > fx:
+            parts.append((fx, fy, x - fx, fh))
+        if x + w < fx + fw:
+            parts.append((x + w, fy, fx + fw - x - w, fh))
+        if y > fy:
+            parts.append((fx, fy, fw, y - fy))
+        if y + h < fy + fh:
+            parts.append((fx, y + h, fw, fy + fh - y - h))
+        return parts
+    
+    @staticmethod
+    def _prune(rects: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+        """Drop free rectangles contained in another one"""
+        def contains(a, b):
+            return (a[0] <= b[0] and a[1] <= b[1] and
+                    a[0] + a[2] >= b[0] + b[2] and a[1] + a[3] >= b[1] + b[3])
+        
+        unique = list(dict.fromkeys(rects))
+        return [
+            rect for i, rect in enumerate(unique)
+            if not any(i != j and contains(other, rect) for j, other in enumerate(unique))
+        ]
+
+
+def _next_power_of_two(value: int) -> int:
+    return 1 << max(0, int(value) - 1).bit_length()
+
+
+def pack_rectangles(sizes: List[Tuple[int, int]]) -> Tuple[int, int, List[Tuple[int, int]]]:
+    """
+    Pack rectangles into the smallest power-of-two sheet that fits them
+    
+    Returns:
+        Sheet width and height, and the top-left corner of each rectangle
+        in input order
+    """
+    if not sizes:
+        return 1, 1, []
+    
+    area = sum(w * h for w, h in sizes)
+    width = _next_power_of_two(max(max(w for w, _ in sizes), int(np.ceil(np.sqrt(area)))))
+    height = _next_power_of_two(max(max(h for _, h in sizes), int(np.ceil(area / width))))
+    
+    # Large rectangles first packs far tighter than input order
+    order = sorted(range(len(sizes)), key=lambda i: (-max(sizes[i]), -min(sizes[i])))
+    
+    while width <= MAX_ATLAS_SIZE and height <= MAX_ATLAS_SIZE:
+        packer = MaxRectsPacker(width, height)
+        positions: List[Optional[Tuple[int, int]]] = [None] * len(sizes)
+        for i in order:
+            positions[i] = packer.insert(*sizes[i])
+            if positions[i] is None:
+                break
+        else:
+            return width, height, positions
+        
+        if width <= height:
+            width *= 2
+        else:
+            height *= 2
+    
+    raise ValueError(f"Frames don't fit in a {MAX_ATLAS_SIZE}x{MAX_ATLAS_SIZE} atlas")
+
+
+def _atlas_layout(entries: List[TextureConfig], padding: int) -> Dict[str, Any]:
+    """Sheet size and UV rect of every frame of every config"""
+    frames = [
+        (entry_idx, frame_idx, config.width, config.height)
+        for entry_idx, config in enumerate(entries)
+        for frame_idx in range(config.animation_frames)
+    ]
+    width, height, positions = pack_rectangles([(w + padding, h + padding) for _, _, w, h in frames])
+    
+    rects = []
+    for (entry_idx, frame_idx, w, h), (x, y) in zip(frames, positions):
+        rects.append({
+            'entry': entry_idx,
+            'frame': frame_idx,
+            'x': x,
+            'y': y,
+            'w': w,
+            'h': h,
+            'uv': [x / width, y / height, (x + w) / width, (y + h) / height]
+        })
+    return {'width': width, 'height': height, 'padding': padding, 'frames': rects}
+
+
+def _mip_sizes(width: int, height: int) -> List[Tuple[int, int]]:
+    """Level sizes of a mip chain, halving (rounding up) until 1x1"""
+    sizes = [(width, height)]
+    while sizes[-1] != (1, 1):
+        w, h = sizes[-1]
+        sizes.append(((w + 1) // 2, (h + 1) // 2))
+    return sizes
+
+
+def _mip_suffix(level: int) -> str:
+    """Map name suffix of a mip level; the top level keeps the plain names"""
+    return f"_mip{level}" if level else ''
+
+
+def _mip_quality(config: TextureConfig, level: int) -> Optional[str]:
+    """Quality preset a mip level of ``config`` corresponds to, if any"""
+    value = Quality[config.quality].value >> level
+    return next((quality.name for quality in Quality if quality.value == value), None)
+
+
+# Tiles read this many neighbour pixels on each inner side: sharpening,
+# normal gradients and AO all look one pixel out
+TILE_MARGIN = 1
+MIN_TILE_SIZE = 64
+
+
+def _tile_layout(config: TextureConfig) -> Dict[str, Any]:
+    """Row-major grid of tiles covering a tiled config, edge tiles cropped"""
+    size = config.tile_size
+    if config.texture_type != 'wall':
+        raise ValueError("Tiled output is only supported for wall textures")
+    if config.atlas or config.mipmaps or config.animation_frames != 1:
+        raise ValueError("Tiled output doesn't support atlas, mipmaps or animation")
+    if size < MIN_TILE_SIZE:
+        raise ValueError(f"tile_size must be at least {MIN_TILE_SIZE}")
+    columns, rows = -(-config.width // size), -(-config.height // size)
+    return {
+        'tile_size': size,
+        'columns': columns,
+        'rows': rows,
+        'tiles': [
+            {
+                'x': x,
+                'y': y,
+                'width': min(size, config.width - x),
+                'height': min(size, config.height - y)
+            }
+            for y in range(0, config.height, size)
+            for x in range(0, config.width, size)
+        ]
+    }
+
+
+def _tile_scratch(scratch: str, config: TextureConfig, name: str, mode: str = 'r+') -> np.memmap:
+    """
+    Full-size plane of a tiled render, memory-mapped from ``scratch``
+    
+    Workers map the same files, so each tile reads and writes only its own
+    window and resident memory stays bounded by the tile size.
+    """
+    dtype, channels = {
+        'noise': (np.float32, ()),
+        'diffuse': (np.uint8, (3,)),
+        'luma': (np.uint8, ())
+    }[name]
+    return np.memmap(os.path.join(scratch, f"{name}.bin"), dtype=dtype, mode=mode,
+                     shape=(config.height, config.width) + channels)
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Raised when the generation queue is full and cannot accept more work"""
+
+
+class DeadlineExceededError(RuntimeError):
+    """Raised when a request can't be generated before its deadline"""
+
+
+class Priority(Enum):
+    """Scheduling classes of generation requests, most urgent first"""
+    INTERACTIVE = 0  # A player is blocked on it
+    NORMAL = 1
+    BULK = 2  # Prefetching and baking
+
+
+@dataclass(eq=False)
+class Schedule:
+    """
+    How urgently a request's generation should run
+    
+    Jobs run by priority, then earliest deadline, then arrival. The
+    deadline is on the time.monotonic() clock. With ``degrade``, a request
+    that would miss its deadline is rendered at a lower Quality rather
+    than rejected.
+    """
+    priority: Priority = Priority.NORMAL
+    deadline: Optional[float] = None
+    degrade: bool = False
+    
+    @classmethod
+    def parse(cls, priority: Any = None, deadline_ms: Any = None, degrade: Any = False) -> 'Schedule':
+        """Build from request values: a priority name and a deadline in milliseconds from now"""
+        level = Priority.NORMAL
+        if priority:
+            try:
+                level = Priority[str(priority).upper()]
+            except KeyError:
+                raise ValueError(f"Unknown priority: {priority}") from None
+        deadline = None
+        if deadline_ms is not None:
+            deadline = time.monotonic() + float(deadline_ms) / 1000
+        if isinstance(degrade, str):
+            degrade = degrade.lower() in ('1', 'true', 'yes', 'on')
+        return cls(level, deadline, bool(degrade))
+    
+    @property
+    def rank(self) -> Tuple[int, float]:
+        """Sort key: lower runs first"""
+        return (self.priority.value, float('inf') if self.deadline is None else self.deadline)
+    
+    def merge(self, other: 'Schedule'):
+        """Take on the urgency of ``other``, a request joining this one's generation"""
+        if other.priority.value < self.priority.value:
+            self.priority = other.priority
+        if other.deadline is not None and (self.deadline is None or other.deadline < self.deadline):
+            self.deadline = other.deadline
+
+
+def estimate_cost(config: TextureConfig) -> int:
+    """Relative cost of generating a config: pixels x frames x output maps"""
+    maps = 1 + config.enable_normal_map + config.enable_specular + config.enable_ao
+    return config.width * config.height * config.animation_frames * maps
+
+
+class _PriorityGate:
+    """
+    Counting semaphore that hands free places to the most urgent waiter
+    
+    Waiters are served by Schedule.rank, then arrival. BULK requests can't
+    take the last ``reserved`` places, so a flood of bulk work can't lock
+    out anything more urgent.
+    """
+    
+    def __init__(self, capacity: int, reserved: int = 0):
+        self.capacity = capacity
+        self.reserved = reserved
+        self.used = 0
+        self._waiters: List[Tuple[Schedule, int, asyncio.Future]] = []
+        self._arrivals = 0
+    
+    def try_acquire(self, schedule: Schedule) -> bool:
+        """Take a place if one is free for ``schedule`` right now"""
+        # Waiters are woken as soon as places free up, so any still waiting
+        # need a place this request couldn't take either
+        if self.used >= self._limit(schedule):
+            return False
+        self.used += 1
+        return True
+    
+    async def acquire(self, schedule: Schedule):
+        if self.try_acquire(schedule):
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._arrivals += 1
+        waiter = (schedule, self._arrivals, future)
+        self._waiters.append(waiter)
+        try:
+            await future
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif future.done() and not future.cancelled():
+                # Granted a place just as the waiter gave up
+                self.release()
+            raise
+    
+    def release(self):
+        self.used -= 1
+        self._wake()
+    
+    def _limit(self, schedule: Schedule) -> int:
+        if schedule.priority is Priority.BULK:
+            return self.capacity - self.reserved
+        return self.capacity
+    
+    def _wake(self):
+        while self._waiters:
+            # Ranks can change while waiting (see Schedule.merge), so pick now
+            waiter = min(self._waiters, key=lambda w: (w[0].rank, w[1]))
+            if waiter[2].done():
+                self._waiters.remove(waiter)
+                continue
+            if self.used >= self._limit(waiter[0]):
+                break
+            self._waiters.remove(waiter)
+            self.used += 1
+            waiter[2].set_result(None)
+
+
+class _WaitStats:
+    """Queue waits: running totals plus recent samples for percentiles"""
+    
+    WINDOW = 1024
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.recent: deque = deque(maxlen=self.WINDOW)
+    
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+    
+    def summary(self) -> Dict[str, float]:
+        p50, p95 = np.percentile(self.recent, [50, 95]) if self.recent else (0.0, 0.0)
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(float(p50) * 1000, 3),
+            'p95_ms': round(float(p95) * 1000, 3),
+            'max_ms': round(max(self.recent, default=0.0) * 1000, 3)
+        }
+
+
+class GenerationExecutor:
+    """
+    Runs CPU-bound generation jobs in worker processes
+    
+    Requests hold a reservation (see ``reserve``) while their jobs run.
+    At most ``max_workers`` requests are served at once and at most
+    ``max_queue`` more wait for a worker. Once both are used up, new
+    requests wait up to ``queue_timeout`` seconds for admission (``None``
+    waits forever, ``0`` rejects immediately) before raising
+    ExecutorSaturatedError. Jobs within reservations share the workers.
+    
+    ``max_workers=0`` runs jobs inline on the event loop, which is only
+    meant for development and tests.
+    
+    Both admission and workers go to the most urgent Schedule first
+    rather than first-come-first-served, and ``interactive_reserve`` of
+    the queue places are held back from BULK requests.
+    """
+    
+    # Initial worker seconds per unit of estimate_cost, refined per kind of
+    # work from what each reservation actually takes. The initial rate
+    # counts as this many units of work, so one-off costs such as starting
+    # a worker don't skew it.
+    SECONDS_PER_UNIT = 1e-7
+    PRIOR_UNITS = 2 ** 24
+    
+    def __init__(self, max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None,
+                 queue_timeout: Optional[float] = 0.0,
+                 interactive_reserve: Optional[int] = None):
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.max_queue = max(1, self.max_workers) * 4 if max_queue is None else max_queue
+        self.queue_timeout = queue_timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        capacity = max(1, self.max_workers) + self.max_queue
+        if interactive_reserve is None:
+            interactive_reserve = max(1, self.max_queue // 4)
+        self._admission = _PriorityGate(capacity, min(interactive_reserve, capacity - 1))
+        self._slots = _PriorityGate(max(1, self.max_workers))
+        # Decaying totals of cost and worker seconds of finished requests, per kind
+        self._observed: Dict[str, List[float]] = {}
+        # Kind, cost and worker seconds so far of each admitted request
+        self._reservations: Dict[Schedule, List[Any]] = {}
+        self._waits = {
+            priority: {'admission': _WaitStats(), 'job': _WaitStats()}
+            for priority in Priority
+        }
+        self._rejected = {priority: 0 for priority in Priority}
+        self.stats = {
+            'workers': self.max_workers,
+            'running': 0,
+            'queued': 0,
+            'completed': 0,
+            'rejected': 0
+        }
+    
+    @contextlib.asynccontextmanager
+    async def reserve(self, schedule: Optional[Schedule] = None, cost: int = 0, kind: str = ''):
+        """
+        Hold a place in the bounded queue for one request and its jobs
+        
+        ``cost`` (see estimate_cost) of work of ``kind``, such as a texture
+        type, feeds predict_seconds while the request is admitted. Jobs of
+        the request pass the same ``schedule`` to run.
+        """
+        schedule = schedule or Schedule()
+        await self._admit(schedule)
+        usage = self._reservations[schedule] = [kind, cost, 0.0]
+        try:
+            yield
+        finally:
+            del self._reservations[schedule]
+            self._admission.release()
+            if cost and usage[2]:
+                # Decay older work, so estimates follow the machine's load
+                observed = self._observed.setdefault(
+                    kind, [float(self.PRIOR_UNITS), self.PRIOR_UNITS * self.SECONDS_PER_UNIT]
+                )
+                observed[0] = 0.9 * observed[0] + cost
+                observed[1] = 0.9 * observed[1] + usage[2]
+    
+    async def run(self, fn, *args, schedule: Optional[Schedule] = None):
+        """Run ``fn(*args)`` on the next free worker, most urgent ``schedule`` first"""
+        schedule = schedule or Schedule()
+        self.stats['queued'] += 1
+        started = time.perf_counter()
+        try:
+            await self._slots.acquire(schedule)
+        finally:
+            self.stats['queued'] -= 1
+        self._waits[schedule.priority]['job'].observe(time.perf_counter() - started)
+        
+        self.stats['running'] += 1
+        started = time.perf_counter()
+        try:
+            if self.max_workers == 0:
+                return fn(*args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            usage = self._reservations.get(schedule)
+            if usage is not None:
+                usage[2] += time.perf_counter() - started
+            self.stats['running'] -= 1
+            self.stats['completed'] += 1
+            self._slots.release()
+    
+    def seconds_per_unit(self, kind: str = '') -> float:
+        """Worker seconds per unit of estimate_cost for work of ``kind``"""
+        observed = self._observed.get(kind)
+        return observed[1] / observed[0] if observed else self.SECONDS_PER_UNIT
+    
+    def predict_seconds(self, cost: int, schedule: Schedule, kind: str = '') -> float:
+        """
+        Estimated time until a request of ``cost`` admitted now would finish
+        
+        The remaining work of admitted requests at least as urgent runs
+        first, spread over the workers.
+        """
+        ahead = sum(
+            max(0.0, other_cost * self.seconds_per_unit(other_kind) - work)
+            for other, (other_kind, other_cost, work) in self._reservations.items()
+            if other.rank <= schedule.rank
+        )
+        return ahead / max(1, self.max_workers) + cost * self.seconds_per_unit(kind)
+    
+    def scheduler_stats(self) -> Dict[str, Any]:
+        """Queue waits and rejections per priority"""
+        return {
+            'seconds_per_megaunit': {
+                kind: round(self.seconds_per_unit(kind) * 1e6, 4) for kind in sorted(self._observed)
+            },
+            'interactive_reserve': self._admission.reserved,
+            'priorities': {
+                priority.name.lower(): {
+                    'admission_wait': waits['admission'].summary(),
+                    'job_wait': waits['job'].summary(),
+                    'rejected': self._rejected[priority]
+                }
+                for priority, waits in self._waits.items()
+            }
+        }
+    
+    async def _admit(self, schedule: Schedule):
+        """Reserve a place in the running set or the bounded queue"""
+        started = time.perf_counter()
+        if not self._admission.try_acquire(schedule):
+            if self.queue_timeout == 0:
+                self._reject(schedule)
+                raise ExecutorSaturatedError("Generation queue is full")
+            try:
+                await asyncio.wait_for(self._admission.acquire(schedule), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject(schedule)
+                raise ExecutorSaturatedError("Timed out waiting for a generation worker")
+        self._waits[schedule.priority]['admission'].observe(time.perf_counter() - started)
+    
+    def _reject(self, schedule: Schedule):
+        self.stats['rejected'] += 1
+        self._rejected[schedule.priority] += 1
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Start worker processes on first use"""
+        if self._pool is None:
+            # Spawned workers don't inherit the event loop or its threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.max_workers,)
+            )
+        return self._pool
+    
+    def shutdown(self):
+        """Stop worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+class StageTimer:
+    """Accumulates wall time spent in each stage of the generation pipeline"""
+    
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.samples: List[Tuple[str, float]] = []
+    
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed
+            self.samples.append((name, elapsed))
+
+
+class ServiceMetrics:
+    """
+    Prometheus instruments for the generation pipeline
+    
+    Every method is a no-op when prometheus_client isn't installed. Stage
+    timings are measured inside worker processes and observed here when
+    their jobs return.
+    """
+    
+    # Latency buckets from sub-millisecond cache hits up to multi-second AAA renders
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+               0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    
+    def __init__(self):
+        self.enabled = CollectorRegistry is not None
+        if not self.enabled:
+            return
+        
+        self.registry = CollectorRegistry()
+        labels = ['texture_type', 'quality']
+        self.stage_seconds = Histogram(
+            'texture_stage_seconds',
+            'Time per call of each generation stage (generate, post_process, normal, specular, ao, encode)',
+            labels + ['stage'], buckets=self.BUCKETS, registry=self.registry
+        )
+        self.cache_lookup_seconds = Histogram(
+            'texture_cache_lookup_seconds', 'Time to look a texture up in the cache',
+            labels + ['result'], buckets=self.BUCKETS, registry=self.registry
+        )
+        self.response_write_seconds = Histogram(
+            'texture_response_write_seconds', 'Time to serialize and write a response',
+            labels + ['format'], buckets=self.BUCKETS, registry=self.registry
+        )
+        self.inflight_requests = Gauge(
+            'texture_inflight_requests', 'Generation requests currently being served',
+            registry=self.registry
+        )
+        self.queue_depth = Gauge(
+            'texture_queue_depth', 'Generation jobs waiting for a worker',
+            registry=self.registry
+        )
+        self.running_jobs = Gauge(
+            'texture_running_jobs', 'Generation jobs currently on a worker',
+            registry=self.registry
+        )
+        self.cache_bytes = Gauge(
+            'texture_cache_bytes', 'Bytes held by each cache tier',
+            ['tier'], registry=self.registry
+        )
+    
+    def bind(self, executor: 'GenerationExecutor', cache: Optional['TieredTextureCache']):
+        """Read queue depth and cache size from their owners at scrape time"""
+        if not self.enabled:
+            return
+        self.queue_depth.set_function(lambda: executor.stats['queued'])
+        self.running_jobs.set_function(lambda: executor.stats['running'])
+        if cache is not None:
+            self.cache_bytes.labels('memory').set_function(lambda: cache.memory.bytes)
+            self.cache_bytes.labels('disk').set_function(lambda: cache.disk.bytes)
+    
+    @staticmethod
+    def labels_for(config: TextureConfig) -> Tuple[str, str]:
+        """Bounded label values, so arbitrary client input can't explode cardinality"""
+        texture_type = config.texture_type if config.texture_type in _TEXTURE_TYPES else 'other'
+        quality = config.quality if config.quality in Quality.__members__ else 'other'
+        return texture_type, quality
+    
+    def observe_stages(self, labels: Tuple[str, str], samples: List[Tuple[str, float]]):
+        if self.enabled:
+            for stage, seconds in samples:
+                self.stage_seconds.labels(*labels, stage).observe(seconds)
+    
+    def observe_cache_lookup(self, labels: Tuple[str, str], hit: bool, seconds: float):
+        if self.enabled:
+            self.cache_lookup_seconds.labels(*labels, 'hit' if hit else 'miss').observe(seconds)
+    
+    def observe_response_write(self, labels: Tuple[str, str], fmt: str, seconds: float):
+        if self.enabled:
+            self.response_write_seconds.labels(*labels, fmt).observe(seconds)
+    
+    @contextlib.contextmanager
+    def track_request(self):
+        if not self.enabled:
+            yield
+            return
+        with self.inflight_requests.track_inprogress():
+            yield
+    
+    def render(self) -> bytes:
+        return generate_latest(self.registry)
+
+
+class _PendingTexture:
+    """
+    Generation shared by identical in-flight requests
+    
+    Metadata resolves once the request is admitted and each frame resolves
+    as soon as its worker job finishes, so streaming callers can forward
+    frames before the whole texture is done.
+    """
+    
+    def __init__(self, frame_count: int, schedule: Optional[Schedule] = None):
+        loop = asyncio.get_running_loop()
+        # A copy, since joining requests can raise its urgency (see Schedule.merge)
+        self.schedule = replace(schedule) if schedule is not None else Schedule()
+        self.metadata: asyncio.Future = loop.create_future()
+        self.frames: List[asyncio.Future] = [loop.create_future() for _ in range(frame_count)]
+        self.task: Optional[asyncio.Task] = None
+        self.encode_seconds = 0.0
+    
+    def resolve(self, result: TextureResult):
+        """Publish a complete result, e.g. from the cache"""
+        self.metadata.set_result(result.metadata)
+        self.resolve_frames(result)
+    
+    def resolve_frames(self, result: TextureResult):
+        """Publish every frame of a result whose metadata is already out"""
+        for idx, frame in enumerate(self.frames):
+            frame.set_result({name: frames[idx] for name, frames in result.maps.items()})
+    
+    def fail(self, error: BaseException):
+        """Propagate an error to everything not yet resolved"""
+        for future in [self.metadata, *self.frames]:
+            if future.done():
+                continue
+            if isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
+                # Waiters still see the error; this only silences the unretrieved warning
+                future.exception()
+
+
+class AdvancedTextureGenerator:
+    """Professional texture generation with advanced algorithms"""
+    
+    # Upper bound on frames rendered by one worker job, so that streamed
+    # responses start promptly even for long animations
+    MAX_FRAMES_PER_JOB = 4
+    
+    # Tiles rendered by one job of each tiled pass
+    MAX_TILES_PER_JOB = 8
+    
+    # Auxiliary maps that lazy requests fetch separately from the diffuse
+    LAZY_MAPS = ('normal', 'specular', 'ao')
+    
+    # Types whose bases aren't cached. A wall's float noise doesn't compress,
+    # so its base would take several times the bytes of its frames, and
+    # fractal_noise's memo shares the noise between theme variants
+    UNCACHED_BASES = ('wall',)
+    
+    def __init__(self, cache_dir: Optional[str] = "./texture_cache",
+                 executor: Optional[GenerationExecutor] = None,
+                 cache: Optional[TieredTextureCache] = None,
+                 metrics: Optional[ServiceMetrics] = None):
+        # A cache_dir of None disables caching (used by worker processes)
+        if cache is None and cache_dir is not None:
+            cache = TieredTextureCache(cache_dir)
+        self.cache = cache
+        self.executor = executor or GenerationExecutor()
+        self.metrics = metrics or ServiceMetrics()
+        self.metrics.bind(self.executor, self.cache)
+        self.stats = {
+            'generated': 0,
+            'cached': 0,
+            'recolored': 0,
+            'coalesced': 0,
+            'degraded': 0,
+            'deadline_rejected': 0,
+            'errors': 0
+        }
+        self._inflight: Dict[str, _PendingTexture] = {}
+        
+    async def generate(self, config: TextureConfig,
+                       schedule: Optional[Schedule] = None) -> TextureResult:
+        """
+        Generate texture with full validation and caching
+        
+        Concurrent requests for the same config share one generation; each
+        caller gets the same result or the same error. Its jobs are
+        scheduled by the most urgent ``schedule`` among them.
+        
+        Returns:
+            TextureResult containing encoded frames per map and metadata
+        """
+        pending = self._join(config, schedule)
+        
+        # Shielded so one caller going away doesn't cancel the shared work
+        return await asyncio.shield(pending.task)
+    
+    async def fit_deadline(self, config: TextureConfig, schedule: Schedule,
+                           key: Optional[str] = None) -> TextureConfig:
+        """
+        Config to generate so ``schedule``'s deadline can be met
+        
+        That is ``config`` itself when its output (``key``, by default the
+        config's cache key) is cached, already in flight or predicted to
+        finish in time. Otherwise, with ``schedule.degrade``, it is the best
+        lower Quality of ``config`` predicted to finish in time. Raises
+        DeadlineExceededError when there is none.
+        """
+        key = key or config.to_cache_key()
+        if schedule.deadline is None or key in self._inflight:
+            return config
+        remaining = schedule.deadline - time.monotonic()
+        predicted = self.executor.predict_seconds(estimate_cost(config), schedule, config.texture_type)
+        if predicted <= remaining or (self.cache is not None and await self.cache.contains(key)):
+            return config
+        
+        if schedule.degrade:
+            for lower in self._degraded_configs(config):
+                if self.executor.predict_seconds(estimate_cost(lower), schedule, lower.texture_type) <= remaining:
+                    self.stats['degraded'] += 1
+                    logger.info(f"Degraded {config.texture_type} from {config.quality} to {lower.quality} "
+                                f"to meet its deadline")
+                    return lower
+        
+        self.stats['deadline_rejected'] += 1
+        raise DeadlineExceededError(
+            f"Estimated {predicted:.2f}s to generate, but the deadline is in {max(remaining, 0.0):.2f}s"
+        )
+    
+    def _degraded_configs(self, config: TextureConfig) -> List[TextureConfig]:
+        """Lower Quality presets of ``config`` with the size scaled to match, best first"""
+        if config.quality not in Quality.__members__:
+            return []
+        top = Quality[config.quality].value
+        return [
+            replace(
+                config,
+                quality=quality.name,
+                width=max(1, config.width * quality.value // top),
+                height=max(1, config.height * quality.value // top)
+            )
+            for quality in sorted(Quality, key=lambda q: q.value, reverse=True)
+            if quality.value < top
+        ]
+    
+    async def get_cached(self, config: TextureConfig) -> Optional[TextureResult]:
+        """Return the cached result for a config without generating it"""
+        cached = await self._lookup(config, config.to_cache_key())
+        if cached is not None:
+            self.stats['cached'] += 1
+        return cached
+    
+    async def _lookup(self, config: TextureConfig, cache_key: str) -> Optional[TextureResult]:
+        """Cache lookup with its latency recorded"""
+        started = time.perf_counter()
+        cached = await self._get_from_cache(cache_key)
+        self.metrics.observe_cache_lookup(
+            ServiceMetrics.labels_for(config), cached is not None, time.perf_counter() - started
+        )
+        return cached
+    
+    async def open_stream(self, config: TextureConfig, schedule: Optional[Schedule] = None
+                          ) -> Tuple[Dict[str, Any], AsyncIterator[Tuple[str, int, bytes]]]:
+        """
+        Start generation and return its metadata plus an iterator of frames
+        
+        The iterator yields ``(map_name, frame_index, data)`` as soon as each
+        frame is encoded. Errors raised before generation starts, such as a
+        full queue, surface here rather than mid-stream.
+        """
+        pending = self._join(config, schedule)
+        metadata = await asyncio.shield(pending.metadata)
+        return metadata, self._iter_frames(pending)
+    
+    async def _iter_frames(self, pending: _PendingTexture) -> AsyncIterator[Tuple[str, int, bytes]]:
+        for idx, frame in enumerate(pending.frames):
+            maps = await asyncio.shield(frame)
+            for name, data in maps.items():
+                yield name, idx, data
+        # Finish with the result, so metadata carries the encoding report
+        await asyncio.shield(pending.task)
+    
+    def _join(self, config: TextureConfig, schedule: Optional[Schedule] = None) -> _PendingTexture:
+        """Return the in-flight generation for this config, starting it if needed"""
+        cache_key = config.to_cache_key()
+        pending = self._inflight.get(cache_key)
+        
+        if pending is not None:
+            self.stats['coalesced'] += 1
+            if schedule is not None:
+                pending.schedule.merge(schedule)
+            logger.info(f"Coalesced request for in-flight {config.texture_type}")
+            return pending
+        
+        pending = _PendingTexture(self._output_count(config), schedule)
+        pending.task = asyncio.ensure_future(self._generate_once(config, cache_key, pending))
+        pending.task.add_done_callback(functools.partial(self._finish_inflight, cache_key))
+        self._inflight[cache_key] = pending
+        return pending
+    
+    async def _generate_once(self, config: TextureConfig, cache_key: str,
+                             pending: _PendingTexture) -> TextureResult:
+        """Cache lookup and generation shared by identical in-flight requests"""
+        try:
+            cached = await self._lookup(config, cache_key)
+            
+            if cached is not None:
+                self.stats['cached'] += 1
+                logger.info(f"Cache hit for {config.texture_type}")
+                pending.resolve(cached)
+                return cached
+            
+            # Generate based on type, off the event loop
+            async with self.executor.reserve(pending.schedule, estimate_cost(config), config.texture_type):
+                metadata = self._build_metadata(config)
+                pending.metadata.set_result(metadata)
+                if config.atlas:
+                    maps = await self._generate_atlas_sheet(config, metadata['atlas'], pending)
+                elif config.tile_size is not None:
+                    maps = await self._generate_tiles(config, metadata['tiles'], pending)
+                else:
+                    maps = await self._generate_frames(config, pending)
+            metadata['encoding'] = self._encoding_report(config, maps, pending.encode_seconds)
+            result = TextureResult(maps=maps, metadata=metadata)
+            
+            # Save to cache
+            await self._save_to_cache(cache_key, result)
+            if config.mipmaps and not config.atlas:
+                await self._save_mip_levels(config, result)
+            
+            self.stats['generated'] += 1
+            logger.info(f"Generated new {config.texture_type} texture")
+            
+            return result
+            
+        except BaseException as e:
+            pending.fail(e)
+            if isinstance(e, Exception) and not isinstance(e, ExecutorSaturatedError):
+                self.stats['errors'] += 1
+                logger.error(f"Error generating texture: {e}", exc_info=True)
+            raise
+    
+    async def _save_mip_levels(self, config: TextureConfig, result: TextureResult):
+        """
+        Cache each mip level as the plain config of its Quality preset
+        
+        A later request for a lower quality of the same config is then a
+        cache hit on the filtered level instead of a fresh render. Levels
+        already cached are left alone.
+        """
+        if self.cache is None:
+            return
+        base_names = self._map_names(replace(config, mipmaps=False))
+        for level, (width, height) in enumerate(_mip_sizes(config.width, config.height)[1:], 1):
+            quality = _mip_quality(config, level)
+            if quality is None:
+                continue
+            level_config = replace(config, mipmaps=False, quality=quality, width=width, height=height)
+            level_key = level_config.to_cache_key()
+            if level_key in self.cache:
+                continue
+            suffix = _mip_suffix(level)
+            maps = {name: result.maps[name + suffix] for name in base_names}
+            # The level was encoded with the chain, so it gets its share of the encoder time
+            chain = result.metadata['encoding']
+            share = sum(len(frame) for frames in maps.values() for frame in frames) / max(1, chain['total_bytes'])
+            metadata = self._build_metadata(level_config)
+            metadata['encoding'] = self._encoding_report(level_config, maps, chain['encode_seconds'] * share)
+            metadata['mip_of'] = config.to_cache_key()
+            await self._save_to_cache(level_key, TextureResult(maps=maps, metadata=metadata))
+    
+    def _finish_inflight(self, cache_key: str, task: asyncio.Task):
+        """Forget a finished generation so the next request starts fresh"""
+        self._inflight.pop(cache_key, None)
+        if not task.cancelled():
+            # Mark the error as retrieved even if every waiter went away
+            task.exception()
+    
+    async def _generate_frames(self, config: TextureConfig,
+                               pending: _PendingTexture) -> Dict[str, List[bytes]]:
+        """Fan frame ranges out to workers, publishing frames as they finish"""
+        bases = await self._lookup_bases(config)
+        new_bases = await self._gather_jobs([
+            self._generate_chunk(config, start, stop, pending, bases and bases[start:stop])
+            for start, stop in self._frame_chunks(config)
+        ])
+        if bases is None:
+            await self._save_bases(config, [base for chunk in new_bases for base in chunk or []])
+        
+        frames = [frame.result() for frame in pending.frames]
+        return {
+            name: [maps[name] for maps in frames]
+            for name in self._map_names(config)
+        }
+    
+    async def _generate_chunk(self, config: TextureConfig, start: int, stop: int,
+                              pending: _PendingTexture,
+                              bases: Optional[List[bytes]] = None) -> Optional[List[bytes]]:
+        rendered, samples, new_bases = await self.executor.run(
+            _run_frame_job, config, start, stop, True, bases, schedule=pending.schedule
+        )
+        self._observe_job(config, samples, pending)
+        for idx, maps in enumerate(rendered, start):
+            pending.frames[idx].set_result(maps)
+        return new_bases
+    
+    async def _lookup_bases(self, config: TextureConfig) -> Optional[List[bytes]]:
+        """
+        Cached theme-neutral bases of a config's frames, if any
+        
+        Another theme or palette of the same texture leaves them behind, so
+        this request only needs a recolour.
+        """
+        if config.texture_type in self.UNCACHED_BASES:
+            return None
+        cached = await self._get_from_cache(self.base_key(config))
+        if cached is None:
+            return None
+        self.stats['recolored'] += 1
+        logger.info(f"Recoloring cached base for {config.texture_type}")
+        return [bytes(base) for base in cached.maps['base']]
+    
+    async def _save_bases(self, config: TextureConfig, bases: List[bytes]):
+        if config.texture_type in self.UNCACHED_BASES:
+            return
+        await self._save_to_cache(self.base_key(config), TextureResult(
+            maps={'base': bases},
+            metadata={'type': 'base', 'frames': len(bases), 'generator_version': GENERATOR_VERSION}
+        ))
+    
+    def _observe_job(self, config: TextureConfig, samples: List[Tuple[str, float]],
+                     pending: _PendingTexture):
+        """Record a worker job's stage timings"""
+        self.metrics.observe_stages(ServiceMetrics.labels_for(config), samples)
+        pending.encode_seconds += sum(seconds for stage, seconds in samples if stage == 'encode')
+    
+    def _encoding_report(self, config: TextureConfig, maps: Dict[str, List[bytes]],
+                         encode_seconds: float) -> Dict[str, Any]:
+        """Encoded sizes and encoder time, to compare compression settings"""
+        encoding = parse_compression(config.compression)
+        sizes = {name: [len(frame) for frame in frames] for name, frames in maps.items()}
+        return {
+            'compression': config.compression,
+            'format': encoding.name,
+            'content_type': encoding.content_type,
+            'bytes': sizes,
+            'total_bytes': sum(sum(frame_sizes) for frame_sizes in sizes.values()),
+            'encode_seconds': round(encode_seconds, 4)
+        }
+    
+    async def _generate_atlas_sheet(self, config: TextureConfig, layout: Dict[str, Any],
+                                    pending: _PendingTexture) -> Dict[str, List[bytes]]:
+        """Render raw frames in parallel, then pack and encode them once"""
+        bases = await self._lookup_bases(config)
+        chunks = await self._gather_jobs([
+            self.executor.run(_run_frame_job, config, start, stop, False, bases and bases[start:stop],
+                              schedule=pending.schedule)
+            for start, stop in self._frame_chunks(config)
+        ])
+        frames, new_bases = [], []
+        for rendered, samples, chunk_bases in chunks:
+            self._observe_job(config, samples, pending)
+            frames.extend(rendered)
+            new_bases.extend(chunk_bases or [])
+        if bases is None:
+            await self._save_bases(config, new_bases)
+        
+        sheets, samples = await self.executor.run(
+            _run_atlas_job, self._atlas_entries(config, frames), layout, config.compression,
+            schedule=pending.schedule
+        )
+        self._observe_job(config, samples, pending)
+        pending.frames[0].set_result(sheets)
+        return {name: [data] for name, data in sheets.items()}
+    
+    async def _generate_tiles(self, config: TextureConfig, layout: Dict[str, Any],
+                              pending: _PendingTexture) -> Dict[str, List[bytes]]:
+        """
+        Render a tiled texture in passes over memory-mapped scratch planes
+        
+        Noise normalization, the contrast mean and the specular mean are
+        global, so each pass reduces per-tile results before the next one
+        starts. Every pass fans tiles out to workers, and tiles read a
+        TILE_MARGIN of neighbour pixels, so the output doesn't depend on the
+        tile size. Tiles are published as soon as all their maps are encoded.
+        """
+        rects = [(tile['x'], tile['y'], tile['width'], tile['height']) for tile in layout['tiles']]
+        names = self._map_names(config)
+        pixels = config.width * config.height
+        
+        def publish(idx: int, maps: Dict[str, bytes]):
+            pending.frames[idx].set_result({name: maps[name] for name in names})
+        
+        with tempfile.TemporaryDirectory(prefix='tiles-') as scratch:
+            for plane in ('noise', 'diffuse') + (('luma',) if config.enable_specular else ()):
+                _tile_scratch(scratch, config, plane, 'w+')
+            run = functools.partial(self._run_tile_pass, config, scratch, rects, pending)
+            
+            ranges = await run('noise')
+            noise_range = (min(low for low, _ in ranges), max(high for _, high in ranges))
+            rng = np.random.default_rng([self._seed_for(config), 0])
+            marks = self._detail_marks(config.width, config.height, rng)
+            sums = await run('diffuse', noise_range, marks)
+            
+            tiles = await run(
+                'maps', int(sum(sums) / pixels + 0.5),
+                on_result=None if config.enable_specular else lambda idx, tile: publish(idx, tile[0])
+            )
+            if config.enable_specular:
+                await run(
+                    'specular', int(sum(luma_sum for _, luma_sum in tiles) / pixels + 0.5),
+                    on_result=lambda idx, data: publish(idx, {**tiles[idx][0], 'specular': data})
+                )
+        
+        frames = [frame.result() for frame in pending.frames]
+        return {name: [maps[name] for maps in frames] for name in names}
+    
+    async def _run_tile_pass(self, config: TextureConfig, scratch: str,
+                             rects: List[Tuple[int, int, int, int]], pending: _PendingTexture,
+                             stage: str, *args,
+                             on_result: Optional[Callable[[int, Any], None]] = None) -> List[Any]:
+        """Run one pass of a tiled render over every tile, returning per-tile results"""
+        async def job(start: int, stop: int) -> List[Any]:
+            results, samples = await self.executor.run(
+                _run_tile_job, stage, config, scratch, rects[start:stop], *args,
+                schedule=pending.schedule
+            )
+            self._observe_job(config, samples, pending)
+            if on_result is not None:
+                for idx, result in enumerate(results, start):
+                    on_result(idx, result)
+            return results
+        
+        chunks = await self._gather_jobs([
+            job(start, stop) for start, stop in self._job_chunks(len(rects), self.MAX_TILES_PER_JOB)
+        ])
+        return [result for results in chunks for result in results]
+    
+    async def generate_atlas(self, configs: List[TextureConfig], padding: int = 1,
+                             schedule: Optional[Schedule] = None) -> TextureResult:
+        """
+        Generate several textures and pack all their frames into one sheet per map
+        
+        Each config is generated (or served from cache) on its own first;
+        frame rects in the metadata refer back to configs by ``entry`` index.
+        """
+        configs = [replace(config, atlas=False, mipmaps=False, tile_size=None) for config in configs]
+        schedule = schedule or Schedule()
+        atlas_key = hashlib.sha256(
+            ':'.join(['atlas', str(padding)] + [c.to_cache_key() for c in configs]).encode()
+        ).hexdigest()
+        cached = await self._get_from_cache(atlas_key)
+        if cached is not None:
+            self.stats['cached'] += 1
+            return cached
+        
+        results = await asyncio.gather(*[self.generate(config, schedule) for config in configs])
+        layout = _atlas_layout(configs, padding)
+        # Cached frames may be memoryviews, which can't be sent to workers
+        entries = [
+            [{name: bytes(frames[idx]) for name, frames in result.maps.items()}
+             for idx in range(config.animation_frames)]
+            for config, result in zip(configs, results)
+        ]
+        # Sheets use the configs' shared compression, or PNG when they differ
+        compressions = {config.compression for config in configs}
+        compression = compressions.pop() if len(compressions) == 1 else 'png'
+        async with self.executor.reserve(schedule, layout['width'] * layout['height'], 'atlas'):
+            sheets, samples = await self.executor.run(
+                _run_atlas_job, entries, layout, compression, schedule=schedule
+            )
+        self.metrics.observe_stages(('atlas', 'other'), samples)
+        
+        result = TextureResult(
+            maps={name: [data] for name, data in sheets.items()},
+            metadata={
+                'width': layout['width'],
+                'height': layout['height'],
+                'frames': 1,
+                'type': 'atlas',
+                'generator_version': GENERATOR_VERSION,
+                'entries': [result.metadata for result in results],
+                'atlas': layout,
+                'encoding': {
+                    'compression': compression,
+                    'format': parse_compression(compression).name,
+                    'content_type': parse_compression(compression).content_type,
+                    'bytes': {name: [len(data)] for name, data in sheets.items()},
+                    'total_bytes': sum(len(data) for data in sheets.values()),
+                    'encode_seconds': round(sum(t for stage, t in samples if stage == 'encode'), 4)
+                },
+                'timestamp': datetime.now().isoformat()
+            }
+        )
+        await self._save_to_cache(atlas_key, result)
+        return result
+    
+    def lazy_diffuse_config(self, config: TextureConfig) -> TextureConfig:
+        """
+        Diffuse-only config rendering the same frames as ``config``
+        
+        The seed is pinned first: an unseeded config derives it from its
+        cache key, which the enabled maps are part of.
+        """
+        if config.atlas or config.mipmaps or config.tile_size is not None:
+            raise ValueError("Lazy maps aren't supported with atlas, mipmap or tiled output")
+        return replace(
+            config,
+            seed=self._seed_for(config),
+            enable_normal_map=False,
+            enable_specular=False,
+            enable_ao=False
+        )
+    
+    def map_key(self, config: TextureConfig, name: str) -> str:
+        """Cache key of one lazily generated map"""
+        base = self.lazy_diffuse_config(config).to_cache_key()
+        return hashlib.sha256(f"{base}:{name}".encode()).hexdigest()
+    
+    async def generate_map(self, config: TextureConfig, name: str,
+                           schedule: Optional[Schedule] = None) -> TextureResult:
+        """
+        Generate one auxiliary map of ``config`` from its diffuse frames
+        
+        The diffuse frames come from the cache (or are generated once), and
+        the map is cached under its own key, so each map is derived on first
+        fetch only. Identical in-flight requests share one derivation.
+        """
+        if name not in self.LAZY_MAPS:
+            raise ValueError(f"Unknown map: {name}")
+        key = self.map_key(config, name)
+        
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats['coalesced'] += 1
+            if schedule is not None:
+                pending.schedule.merge(schedule)
+        else:
+            pending = _PendingTexture(config.animation_frames, schedule)
+            pending.task = asyncio.ensure_future(self._generate_map_once(config, name, key, pending))
+            pending.task.add_done_callback(functools.partial(self._finish_inflight, key))
+            self._inflight[key] = pending
+        
+        return await asyncio.shield(pending.task)
+    
+    async def _generate_map_once(self, config: TextureConfig, name: str, key: str,
+                                 pending: _PendingTexture) -> TextureResult:
+        try:
+            cached = await self._lookup(config, key)
+            if cached is not None:
+                self.stats['cached'] += 1
+                pending.resolve(cached)
+                return cached
+            
+            diffuse_config = self.lazy_diffuse_config(config)
+            diffuse = await self.generate(diffuse_config, pending.schedule)
+            # Cached frames may be memoryviews, which can't be sent to workers
+            frames = [bytes(frame) for frame in diffuse.maps['diffuse']]
+            
+            # One map costs about as much as the diffuse it derives from
+            async with self.executor.reserve(pending.schedule, estimate_cost(diffuse_config), f"{name} map"):
+                metadata = {**diffuse.metadata, 'map': name}
+                pending.metadata.set_result(metadata)
+                chunks = await self._gather_jobs([
+                    self.executor.run(_run_map_job, config, name, frames[start:stop],
+                                      schedule=pending.schedule)
+                    for start, stop in self._frame_chunks(config)
+                ])
+            encoded = []
+            for rendered, samples in chunks:
+                self._observe_job(config, samples, pending)
+                encoded.extend(rendered)
+            metadata['encoding'] = self._encoding_report(config, {name: encoded}, pending.encode_seconds)
+            result = TextureResult(maps={name: encoded}, metadata=metadata)
+            pending.resolve_frames(result)
+            
+            await self._save_to_cache(key, result)
+            self.stats['generated'] += 1
+            logger.info(f"Generated lazy {name} map for {config.texture_type}")
+            return result
+            
+        except BaseException as e:
+            pending.fail(e)
+            if isinstance(e, Exception) and not isinstance(e, ExecutorSaturatedError):
+                self.stats['errors'] += 1
+                logger.error(f"Error generating {name} map: {e}", exc_info=True)
+            raise
+    
+    async def _gather_jobs(self, coros: List[Awaitable]) -> List[Any]:
+        """Run jobs concurrently, cancelling the rest as soon as one fails"""
+        jobs = [asyncio.ensure_future(coro) for coro in coros]
+        try:
+            return await asyncio.gather(*jobs)
+        except BaseException:
+            for job in jobs:
+                job.cancel()
+            raise
+    
+    def _frame_chunks(self, config: TextureConfig) -> List[Tuple[int, int]]:
+        """Split the animation into contiguous frame ranges, one per worker job"""
+        return self._job_chunks(config.animation_frames, self.MAX_FRAMES_PER_JOB)
+    
+    def _job_chunks(self, count: int, limit: int) -> List[Tuple[int, int]]:
+        """Split ``count`` items into contiguous ranges of at most ``limit``, spread over the workers"""
+        workers = max(1, self.executor.max_workers)
+        size = max(1, min(limit, -(-count // workers)))
+        return [(start, min(start + size, count)) for start in range(0, count, size)]
+    
+    def _output_count(self, config: TextureConfig) -> int:
+        """Entries per map: one atlas sheet, one per tile or one per frame"""
+        if config.atlas:
+            return 1
+        if config.tile_size is not None:
+            return len(_tile_layout(config)['tiles'])
+        return config.animation_frames
+    
+    def _map_names(self, config: TextureConfig) -> List[str]:
+        """Maps produced for a config, in output order"""
+        names = ['diffuse']
+        if config.enable_normal_map:
+            names.append('normal')
+        if config.enable_specular:
+            names.append('specular')
+        if config.enable_ao:
+            names.append('ao')
+        if config.mipmaps:
+            levels = len(_mip_sizes(config.width, config.height))
+            names = [name + _mip_suffix(level) for level in range(levels) for name in names]
+        return names
+    
+    def _mip_configs(self, config: TextureConfig) -> List[TextureConfig]:
+        """One config per mip level, sized to that level"""
+        return [
+            replace(config, mipmaps=False, width=width, height=height)
+            for width, height in _mip_sizes(config.width, config.height)
+        ]
+    
+    def _atlas_entries(self, config: TextureConfig,
+                       frames: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Split rendered frames into atlas entries: the config, or one per mip level"""
+        if not config.mipmaps:
+            return [frames]
+        base_names = self._map_names(replace(config, mipmaps=False))
+        return [
+            [{name: maps[name + _mip_suffix(level)] for name in base_names} for maps in frames]
+            for level in range(len(_mip_sizes(config.width, config.height)))
+        ]
+    
+    def validate(self, config: TextureConfig):
+        """Raise ValueError for settings that generation would only reject once started"""
+        parse_compression(config.compression)
+        self._resolve_palette(config)
+        if config.tile_size is not None:
+            _tile_layout(config)
+        if config.atlas:
+            self._sheet_layout(config)
+    
+    def _sheet_layout(self, config: TextureConfig) -> Dict[str, Any]:
+        """Layout of an atlas config's sheet; with mipmaps, each level is an entry of its own"""
+        entries = self._mip_configs(config) if config.mipmaps else [config]
+        return _atlas_layout(entries, config.atlas_padding)
+    
+    def _build_metadata(self, config: TextureConfig) -> Dict[str, Any]:
+        # Reject an unknown compression or palette before any rendering
+        self.validate(config)
+        metadata = {
+            'width': config.width,
+            'height': config.height,
+            'frames': config.animation_frames,
+            'type': config.texture_type,
+            'generator_version': GENERATOR_VERSION,
+            'timestamp': datetime.now().isoformat()
+        }
+        if config.mipmaps:
+            metadata['mips'] = [
+                {
+                    'level': level,
+                    'width': width,
+                    'height': height,
+                    'quality': _mip_quality(config, level),
+                    'suffix': _mip_suffix(level)
+                }
+                for level, (width, height) in enumerate(_mip_sizes(config.width, config.height))
+            ]
+        if config.atlas:
+            metadata['atlas'] = self._sheet_layout(config)
+        if config.tile_size is not None:
+            metadata['tiles'] = _tile_layout(config)
+        return metadata
+    
+    def _get_frame_generator(self, config: TextureConfig) -> Callable[..., Dict[str, np.ndarray]]:
+        """Select the method rendering a frame's theme-neutral base"""
+        generator_map = {
+            "wall": self._wall_base,
+            "sprite": self._sprite_base,
+            "ui": self._ui_base,
+            "weapon": self._weapon_base,
+            "animated": self._sprite_base
+        }
+        return generator_map.get(config.texture_type, self._default_base)
+    
+    def _get_batch_generator(self, config: TextureConfig) -> Optional[Callable[..., List[Dict[str, np.ndarray]]]]:
+        """Method rendering several frames' bases in one vectorized pass, if the type has one"""
+        batch_map = {
+            "particle": self._particle_bases,
+            "effect": self._particle_bases,
+            "projectile": self._projectile_bases
+        }
+        return batch_map.get(config.texture_type)
+    
+    def _get_finisher(self, config: TextureConfig) -> Optional[Callable[[Image.Image], Image.Image]]:
+        """Colour-dependent step some types apply after recolouring"""
+        return {"weapon": self._add_highlight}.get(config.texture_type)
+    
+    def base_key(self, config: TextureConfig) -> str:
+        """Cache key of a config's bases: the config without theme, palette or later stages"""
+        neutral = replace(config, **_BASE_NEUTRAL)
+        return hashlib.sha256(f"base:{neutral.to_cache_key()}".encode()).hexdigest()
+    
+    def _seed_for(self, config: TextureConfig) -> int:
+        """
+        Seed of a config, derived from its base key when none is given
+        
+        Theme variants of an unseeded config thus share their noise.
+        """
+        if config.seed is not None:
+            return config.seed % 2**64
+        return int(self.base_key(config)[:16], 16)
+    
+    def _generate_texture(self, config: TextureConfig) -> TextureResult:
+        """Core generation logic"""
+        if config.tile_size is not None:
+            # Whole-frame rendering would defeat the point of tiling
+            raise ValueError("Tiled textures are only generated through generate()")
+        metadata = self._build_metadata(config)
+        timer = StageTimer()
+        if config.atlas:
+            frames = self._render_frames(config, 0, config.animation_frames, encode=False, timer=timer)
+            sheets = self._pack_atlas(
+                self._atlas_entries(config, frames), metadata['atlas'], timer, config.compression
+            )
+            maps = {name: [data] for name, data in sheets.items()}
+        else:
+            frames = self._render_frames(config, 0, config.animation_frames, timer=timer)
+            maps = {
+                name: [maps[name] for maps in frames]
+                for name in self._map_names(config)
+            }
+        metadata['encoding'] = self._encoding_report(config, maps, timer.seconds.get('encode', 0.0))
+        return TextureResult(maps=maps, metadata=metadata)
+    
+    def _render_bases(self, config: TextureConfig, start: int, stop: int,
+                      timer: Optional[StageTimer] = None) -> List[Dict[str, np.ndarray]]:
+        """
+        Theme-neutral bases of frames ``start`` to ``stop``
+        
+        A base holds colour indices (and alpha), or the layers of a wall,
+        so any palette can be applied to it with _recolor.
+        """
+        timer = timer or StageTimer()
+        batch_generator = self._get_batch_generator(config)
+        with timer.stage('generate'):
+            if batch_generator is not None:
+                return batch_generator(config, range(start, stop))
+            generator = self._get_frame_generator(config)
+            # Each frame draws from its own stream, so output doesn't depend
+            # on concurrency or on how frames are split into jobs
+            return [
+                generator(config, frame_idx, np.random.default_rng([self._seed_for(config), frame_idx]))
+                for frame_idx in range(start, stop)
+            ]
+    
+    def _render_frames(self, config: TextureConfig, start: int, stop: int,
+                       encode: bool = True,
+                       timer: Optional[StageTimer] = None,
+                       bases: Optional[List[Dict[str, np.ndarray]]] = None) -> List[Dict[str, Any]]:
+        """
+        Render and post-process frames ``start`` to ``stop`` with their maps
+        
+        Frames are recoloured from ``bases`` when given (e.g. from the cache)
+        and rendered from scratch otherwise. They are encoded per
+        ``config.compression`` unless ``encode`` is False, in which case the
+        images are returned for further composition. Time spent in each
+        pipeline stage is added to ``timer`` when one is given.
+        """
+        timer = timer or StageTimer()
+        if bases is None:
+            bases = self._render_bases(config, start, stop, timer)
+        palette = self._resolve_palette(config)
+        finish = self._get_finisher(config)
+        
+        diffuse = []
+        for base in bases:
+            with timer.stage('recolor'):
+                img = self._recolor(base, palette)
+                if finish is not None:
+                    img = finish(img)
+            
+            # Post-processing
+            with timer.stage('post_process'):
+                img = self._apply_post_processing(img, config)
+            diffuse.append(img)
+        
+        levels = [diffuse]
+        if config.mipmaps:
+            with timer.stage('mipmaps'):
+                for _ in _mip_sizes(config.width, config.height)[1:]:
+                    levels.append([self._downsample(img) for img in levels[-1]])
+        
+        # Additional maps are derived for all frames at once, per level
+        maps = {}
+        for level, images in enumerate(levels):
+            suffix = _mip_suffix(level)
+            maps['diffuse' + suffix] = images
+            for name, derived in self._derive_maps(images, config, timer).items():
+                maps[name + suffix] = derived
+        
+        if encode:
+            # Every image of the job goes to the encoder pool at once
+            with timer.stage('encode'):
+                flat = self._encode_images(
+                    [img for images in maps.values() for img in images], config.compression
+                )
+            maps = {
+                name: flat[offset * len(diffuse):(offset + 1) * len(diffuse)]
+                for offset, name in enumerate(maps)
+            }
+        
+        return [{name: images[idx] for name, images in maps.items()} for idx in range(len(diffuse))]
+    
+    def _render_map(self, config: TextureConfig, name: str, frames: List[bytes],
+                    timer: Optional[StageTimer] = None) -> List[bytes]:
+        """Derive and encode one auxiliary map from encoded diffuse frames"""
+        timer = timer or StageTimer()
+        with timer.stage('decode'):
+            images = [_decode_image(frame) for frame in frames]
+        only = replace(
+            config,
+            enable_normal_map=name == 'normal',
+            enable_specular=name == 'specular',
+            enable_ao=name == 'ao'
+        )
+        maps = self._derive_maps(images, only, timer)[name]
+        with timer.stage('encode'):
+            return self._encode_images(maps, config.compression)
+    
+    def _pack_atlas(self, entries: List[List[Dict[str, Any]]], layout: Dict[str, Any],
+                    timer: Optional[StageTimer] = None,
+                    compression: str = 'png') -> Dict[str, bytes]:
+        """
+        Paste frames into one sheet per map following ``layout``
+        
+        ``entries`` holds the frames of each packed config, as images or
+        encoded bytes keyed by map name.
+        """
+        placed: Dict[str, List[Tuple[Image.Image, Tuple[int, int]]]] = {}
+        for rect in layout['frames']:
+            for name, frame in entries[rect['entry']][rect['frame']].items():
+                if isinstance(frame, (bytes, memoryview)):
+                    frame = _decode_image(frame)
+                placed.setdefault(name, []).append((frame, (rect['x'], rect['y'])))
+        
+        sheets = {}
+        for name, frames in placed.items():
+            mode = 'RGBA' if any(img.mode == 'RGBA' for img, _ in frames) else 'RGB'
+            sheet = Image.new(mode, (layout['width'], layout['height']), (0, 0, 0, 0) if mode == 'RGBA' else (0, 0, 0))
+            for img, position in frames:
+                sheet.paste(img.convert(mode), position)
+            sheets[name] = sheet
+        
+        with (timer or StageTimer()).stage('encode'):
+            return dict(zip(sheets, self._encode_images(list(sheets.values()), compression)))
     
-    async def _generate_wall_texture(self, config: TextureConfig, frame: int) -> Image.Image:
-        """Generate AAA-quality wall texture with procedural detail"""
-        img = Image.new('RGB', (config.width, config.height))
-        draw = ImageDraw.Draw(img)
+    def _recolor(self, base: Dict[str, np.ndarray], palette: Dict[str, tuple]) -> Image.Image:
+        """Colour a theme-neutral base with ``palette``"""
+        if 'noise' in base:
+            return Image.fromarray(self._wall_pixels(base, palette), 'RGB')
+        # PIL's palette conversion applies the LUT faster than numpy indexing
+        img = Image.fromarray(base['index'], 'P')
+        img.putpalette(_color_lut(palette).tobytes())
+        if 'alpha' not in base:
+            return img.convert('RGB')
+        img = img.convert('RGBA')
+        img.putalpha(Image.fromarray(base['alpha'], 'L'))
+        return img
+    
+    def _wall_base(self, config: TextureConfig, frame: int,
+                   rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """Layers of an AAA-quality wall texture with procedural detail"""
+        # Procedural noise for variation, applied to all pixels in one pass
+        noise = self._generate_perlin_noise(config.width, config.height, scale=0.1,
+                                            seed=self._seed_for(config))
         
-        # Base color from theme
-        palette = self._get_theme_palette(config.theme)
-        base_color = palette['primary']
-        
-        # Procedural noise for variation
-        noise = self._generate_perlin_noise(config.width, config.height, scale=0.1)
-        pixels = img.load()
-        
-        for y in range(config.height):
-            for x in range(config.width):
-                # Apply noise variation
-                noise_val = noise[y, x]
-                r = int(base_color[0] * (0.8 + 0.4 * noise_val))
-                g = int(base_color[1] * (0.8 + 0.4 * noise_val))
-                b = int(base_color[2] * (0.8 + 0.4 * noise_val))
-                pixels[x, y] = (
-                    max(0, min(255, r)),
-                    max(0, min(255, g)),
-                    max(0, min(255, b))
-                )
+        # Detail marks and weathering stay separate until a palette is applied
+        marks = self._detail_marks(config.width, config.height, rng)
+        weathering = rng.integers(-10, 10, (config.height, config.width, 3), dtype=np.int16)
+        return {
+            'noise': noise,
+            'detail': self._detail_alpha(noise.shape, marks),
+            'weathering': weathering.astype(np.int8)
+        }
+    
+    def _wall_pixels(self, base: Dict[str, np.ndarray], palette: Dict[str, tuple]) -> np.ndarray:
+        """Tint, detail and weather a wall base"""
+        pixels = self._composite_detail(self._tint(base['noise'], palette), base['detail'], palette)
+        weathered = pixels.astype(np.int16)
+        weathered += base['weathering']
+        return np.clip(weathered, 0, 255).astype(np.uint8)
+    
+    def _tint(self, noise: np.ndarray, palette: Dict[str, tuple]) -> np.ndarray:
+        """Wall base colour modulated by noise in [0, 1]"""
+        base_color = np.array(palette['primary'], dtype=np.float64)
+        tint = (0.8 + 0.4 * noise)[:, :, np.newaxis] * base_color
+        return np.clip(tint.astype(np.int32), 0, 255).astype(np.uint8)
+    
+    def _tile_window(self, config: TextureConfig, rect: Tuple[int, int, int, int]
+                     ) -> Tuple[Tuple[int, int, int, int], Tuple[int, int, int, int]]:
+        """A tile grown by TILE_MARGIN within the image, and the tile's box inside it"""
+        x, y, width, height = rect
+        left, top = max(0, x - TILE_MARGIN), max(0, y - TILE_MARGIN)
+        right = min(config.width, x + width + TILE_MARGIN)
+        bottom = min(config.height, y + height + TILE_MARGIN)
+        return (left, top, right, bottom), (x - left, y - top, x - left + width, y - top + height)
+    
+    def _tile_noise(self, config: TextureConfig, scratch: str, rect: Tuple[int, int, int, int],
+                    timer: StageTimer) -> Tuple[np.float32, np.float32]:
+        """Tiled pass 1: raw wall noise of one tile, returning its range"""
+        x, y, width, height = rect
+        with timer.stage('generate'):
+            noise = fractal_noise_window(config.width, config.height, scale=0.1,
+                                         seed=self._seed_for(config),
+                                         window=(x, y, x + width, y + height))
+        _tile_scratch(scratch, config, 'noise')[y:y + height, x:x + width] = noise
+        return noise.min(), noise.max()
+    
+    def _tile_diffuse(self, config: TextureConfig, scratch: str, rect: Tuple[int, int, int, int],
+                      noise_range: Tuple[np.float32, np.float32], marks: List[Tuple[int, int, int, int]],
+                      timer: StageTimer) -> int:
+        """
+        Tiled pass 2: colour, detail, weather and sharpen one tile
         
-        # Add detail layers
-        img = await self._add_detail_layer(img, palette)
-        img = await self._add_weathering(img)
+        Weathering is hashed from pixel positions rather than drawn from the
+        frame's stream, so neighbouring tiles agree on their shared margin.
+        Returns the tile's luminance sum for the global contrast mean.
+        """
+        window, box = self._tile_window(config, rect)
+        left, top, right, bottom = window
+        palette = self._resolve_palette(config)
+        with timer.stage('generate'):
+            noise = np.array(_tile_scratch(scratch, config, 'noise', 'r')[top:bottom, left:right])
+            low, high = noise_range
+            if high > low:
+                noise = (noise - low) / (high - low)
+            else:
+                noise[:] = 0.5
+            detail = self._detail_alpha(noise.shape, marks, (left, top))
+            pixels = self._composite_detail(self._tint(noise, palette), detail, palette)
+            weathered = pixels.astype(np.int16)
+            weathered += _pixel_noise(self._seed_for(config), 0, window, config.width, -10, 10)
+            pixels = np.clip(weathered, 0, 255).astype(np.uint8)
         
-        return img
+        # PIL leaves the window's outer pixels unsharpened: the image border,
+        # as in a whole-frame render, or margin that is cropped away
+        with timer.stage('post_process'):
+            img = Image.fromarray(pixels, 'RGB').filter(ImageFilter.SHARPEN).crop(box)
+        x, y, width, height = rect
+        _tile_scratch(scratch, config, 'diffuse')[y:y + height, x:x + width] = np.asarray(img)
+        return int(self._luminance([img]).sum(dtype=np.int64))
     
-    async def _generate_sprite_texture(self, config: TextureConfig, frame: int) -> Image.Image:
-        """Generate character/sprite with animation support"""
-        img = Image.new('RGBA', (config.width, config.height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
+    def _tile_maps(self, config: TextureConfig, scratch: str, rect: Tuple[int, int, int, int],
+                   mean: int, timer: StageTimer) -> Tuple[Dict[str, bytes], int]:
+        """
+        Tiled pass 3: contrast one tile and derive its normal and AO maps
+        
+        Returns the encoded maps and, when specular is enabled, the tile's
+        luminance sum; its luminance is kept for the specular pass.
+        """
+        window, box = self._tile_window(config, rect)
+        left, top, right, bottom = window
+        img = Image.fromarray(np.array(_tile_scratch(scratch, config, 'diffuse', 'r')[top:bottom, left:right]), 'RGB')
+        with timer.stage('post_process'):
+            # ImageEnhance.Contrast with the whole texture's mean
+            degenerate = Image.new('RGB', img.size, (mean, mean, mean))
+            img = Image.blend(degenerate, img, self._contrast_factor(config))
         
-        palette = self._get_theme_palette(config.theme)
+        maps = {'diffuse': img.crop(box)}
+        luma_sum = 0
+        if config.enable_normal_map or config.enable_specular or config.enable_ao:
+            with timer.stage('luminance'):
+                luma = self._luminance([img])
+            if config.enable_normal_map:
+                with timer.stage('normal'):
+                    maps['normal'] = Image.fromarray(self._generate_normal_map(luma)[0]).crop(box)
+            if config.enable_ao:
+                with timer.stage('ao'):
+                    maps['ao'] = Image.fromarray(self._generate_ao_map(luma)[0]).crop(box)
+            if config.enable_specular:
+                x, y, width, height = rect
+                tile_luma = luma[0, box[1]:box[3], box[0]:box[2]]
+                _tile_scratch(scratch, config, 'luma')[y:y + height, x:x + width] = tile_luma
+                luma_sum = int(tile_luma.sum(dtype=np.int64))
         
+        with timer.stage('encode'):
+            encoded = self._encode_images(list(maps.values()), config.compression)
+        return dict(zip(maps, encoded)), luma_sum
+    
+    def _tile_specular(self, config: TextureConfig, scratch: str, rect: Tuple[int, int, int, int],
+                       mean: int, timer: StageTimer) -> bytes:
+        """Tiled pass 4: specular map of one tile around the whole texture's mean"""
+        x, y, width, height = rect
+        luma = np.array(_tile_scratch(scratch, config, 'luma', 'r')[y:y + height, x:x + width])
+        with timer.stage('specular'):
+            specular = self._generate_specular_map(luma[np.newaxis], np.array([mean], dtype=np.int16))
+        with timer.stage('encode'):
+            return self._encode_images([Image.fromarray(specular[0])], config.compression)[0]
+    
+    def _sprite_base(self, config: TextureConfig, frame: int,
+                     rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """Character/sprite with animation support"""
         # Animation offset
         bounce = int(np.sin(frame * 0.5) * 5)
         
-        # Draw character (example: cat)
+        # Draw character (example: cat). Only the bounce and the ears change
+        # between frames, so the rest is drawn once and cropped into place.
         center_x, center_y = config.width // 2, config.height // 2
-        
-        # Body
         body_radius = config.width // 3
-        draw.ellipse(
-            [center_x - body_radius, center_y - body_radius + bounce,
-             center_x + body_radius, center_y + body_radius + bounce],
-            fill=palette['secondary']
-        )
-        
-        # Head
         head_radius = config.width // 4
         head_y = center_y - body_radius // 2
-        draw.ellipse(
-            [center_x - head_radius, head_y - head_radius + bounce,
-             center_x + head_radius, head_y + head_radius + bounce],
-            fill=palette['secondary']
-        )
         
         # Ears (animated)
+        img = Image.new('L', (config.width, config.height), 0)
+        draw = ImageDraw.Draw(img)
         ear_offset = 2 + int(np.sin(frame * 0.3) * 3)
         left_ear = [
             (center_x - head_radius // 2, head_y - head_radius + bounce),
@@ -256,73 +3096,62 @@ class AdvancedTextureGenerator:
             (center_x + head_radius, head_y - head_radius - ear_offset + bounce),
             (center_x + head_radius // 4, head_y - head_radius // 2 + bounce)
         ]
-        draw.polygon(left_ear, fill=palette['secondary'])
-        draw.polygon(right_ear, fill=palette['secondary'])
-        
-        # Eyes
-        eye_size = config.width // 16
-        draw.ellipse(
-            [center_x - head_radius // 2 - eye_size, head_y - eye_size + bounce,
-             center_x - head_radius // 2 + eye_size, head_y + eye_size + bounce],
-            fill=(255, 255, 255)
-        )
-        draw.ellipse(
-            [center_x + head_radius // 2 - eye_size, head_y - eye_size + bounce,
-             center_x + head_radius // 2 + eye_size, head_y + eye_size + bounce],
-            fill=(255, 255, 255)
-        )
-        
-        # Pupils
-        pupil_size = eye_size // 2
-        draw.ellipse(
-            [center_x - head_radius // 2 - pupil_size, head_y - pupil_size + bounce,
-             center_x - head_radius // 2 + pupil_size, head_y + pupil_size + bounce],
-            fill=(0, 0, 0)
-        )
-        draw.ellipse(
-            [center_x + head_radius // 2 - pupil_size, head_y - pupil_size + bounce,
-             center_x + head_radius // 2 + pupil_size, head_y + pupil_size + bounce],
-            fill=(0, 0, 0)
-        )
+        draw.polygon(left_ear, fill=_SLOT_INDEX['secondary'])
+        draw.polygon(right_ear, fill=_SLOT_INDEX['secondary'])
         
-        # Add soft shadow
-        img = await self._add_soft_shadow(img)
+        # Body, head and eyes on top: the ears share the body colour, so
+        # only the eyes would differ, and those are drawn last anyway
+        top = _SPRITE_BOUNCE - bounce
+        static = _sprite_static_layer(config.width, config.height)[top:top + config.height]
+        index = np.where(static > 0, static, np.asarray(img))
         
-        return img
+        # Soft black shadow wherever the sprite leaves the canvas empty
+        alpha = np.where(index > 0, 255, _soft_shadow_layer(config.width, config.height))
+        return {'index': index, 'alpha': alpha.astype(np.uint8)}
     
-    async def _generate_particle_texture(self, config: TextureConfig, frame: int) -> Image.Image:
-        """Generate particle effect texture"""
-        img = Image.new('RGBA', (config.width, config.height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
+    def _particle_bases(self, config: TextureConfig, frames: Sequence[int]) -> List[Dict[str, np.ndarray]]:
+        """
+        Expanding, fading particle frames from one (frames, H, W) computation
         
-        palette = self._get_theme_palette(config.theme)
+        Alpha ramps up with the distance from the centre to the particle's
+        radius, then falls off over the width a blur of PARTICLE_SOFTNESS
+        pixels would give the edge.
+        """
         center = config.width // 2
         
         # Animated particle expansion
-        radius = int(center * (0.3 + 0.7 * (frame / max(1, config.animation_frames - 1))))
-        alpha = int(255 * (1 - frame / max(1, config.animation_frames - 1)))
+        progress = np.array(frames, dtype=np.float32) / max(1, config.animation_frames - 1)
+        radius = (center * (0.3 + 0.7 * progress)).astype(np.int32).astype(np.float32)
+        alpha = (255 * (1 - progress)).astype(np.int32).astype(np.float32)
         
-        # Gradient particle
-        for r in range(radius, 0, -1):
-            color_alpha = int(alpha * (r / radius))
-            color = palette['accent'] + (color_alpha,)
-            draw.ellipse(
-                [center - r, center - r, center + r, center + r],
-                fill=color
-            )
+        distance = _radial_distance(config.width, config.height, center, center)[np.newaxis]
+        radius = radius[:, np.newaxis, np.newaxis]
+        field = np.minimum(distance, radius)
+        field *= (alpha / np.maximum(radius[:, 0, 0], 1))[:, np.newaxis, np.newaxis]
+        field[radius[:, 0, 0] == 0] = 0
         
-        # Apply blur for soft edges
-        img = img.filter(ImageFilter.GaussianBlur(radius=3))
+        # Logistic approximation of a Gaussian-blurred edge
+        edge = distance - radius
+        edge *= np.float32(1.702 / PARTICLE_SOFTNESS)
+        np.clip(edge, -60, 60, out=edge)
+        np.exp(edge, out=edge)
+        edge += 1
+        field /= edge
         
-        return img
+        return self._glow_bases(field, 'accent')
     
-    async def _generate_weapon_texture(self, config: TextureConfig, frame: int) -> Image.Image:
-        """Generate weapon sprite"""
-        img = Image.new('RGBA', (config.width, config.height), (0, 0, 0, 0))
+    def _glow_bases(self, alpha: np.ndarray, slot: str) -> List[Dict[str, np.ndarray]]:
+        """Bases coloured by ``slot`` with stacked float ``alpha``, transparent black elsewhere"""
+        alpha = np.clip(alpha + 0.5, 0, 255).astype(np.uint8)
+        index = (alpha > 0).view(np.uint8) * np.uint8(_SLOT_INDEX[slot])
+        return [{'index': frame_index, 'alpha': frame_alpha} for frame_index, frame_alpha in zip(index, alpha)]
+    
+    def _weapon_base(self, config: TextureConfig, frame: int,
+                     rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """Weapon sprite"""
+        img = Image.new('L', (config.width, config.height), 0)
         draw = ImageDraw.Draw(img)
         
-        palette = self._get_theme_palette(config.theme)
-        
         # Banana gun shape
         points = [
             (config.width * 0.1, config.height * 0.5),
@@ -333,83 +3162,73 @@ class AdvancedTextureGenerator:
             (config.width * 0.1, config.height * 0.7)
         ]
         
-        draw.polygon(points, fill=palette['primary'], outline=palette['accent'])
+        draw.polygon(points, fill=_SLOT_INDEX['primary'], outline=_SLOT_INDEX['accent'])
         
-        # Add highlights
+        index = np.array(img)
+        return {'index': index, 'alpha': np.where(index > 0, 255, 0).astype(np.uint8)}
+    
+    def _add_highlight(self, img: Image.Image) -> Image.Image:
+        """Add highlights"""
         highlight = ImageEnhance.Brightness(img).enhance(1.3)
-        img = Image.blend(img, highlight, 0.3)
-        
-        return img
+        return Image.blend(img, highlight, 0.3)
     
-    async def _generate_projectile_texture(self, config: TextureConfig, frame: int) -> Image.Image:
-        """Generate projectile texture"""
-        img = Image.new('RGBA', (config.width, config.height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
-        
-        palette = self._get_theme_palette(config.theme)
+    def _projectile_bases(self, config: TextureConfig, frames: Sequence[int]) -> List[Dict[str, np.ndarray]]:
+        """Glowing projectile frames: alpha grows towards an anti-aliased rim"""
         center = config.width // 2
         
-        # Glowing projectile
-        for r in range(center, 0, -2):
-            alpha = int(255 * (r / center))
-            color = palette['primary'] + (alpha,)
-            draw.ellipse(
-                [center - r, center - r, center + r, center + r],
-                fill=color
-            )
+        distance = _radial_distance(config.width, config.height, center, center)
+        # Fraction of each pixel inside the disk, then the glow ramp
+        coverage = np.clip(center + 0.5 - distance, 0, 1)
+        field = 255 * np.minimum(distance / max(center, 1), 1) * coverage
         
-        return img
-    
-    async def _generate_effect_texture(self, config: TextureConfig, frame: int) -> Image.Image:
-        """Generate visual effect texture"""
-        return await self._generate_particle_texture(config, frame)
-    
-    async def _generate_animated_texture(self, config: TextureConfig, frame: int) -> Image.Image:
-        """Generate animated texture sequence"""
-        return await self._generate_sprite_texture(config, frame)
+        # Projectiles don't animate, so every frame shares one base
+        return self._glow_bases(field[np.newaxis], 'primary') * len(frames)
     
-    async def _generate_ui_texture(self, config: TextureConfig, frame: int) -> Image.Image:
-        """Generate UI element texture"""
-        img = Image.new('RGBA', (config.width, config.height), (0, 0, 0, 180))
+    def _ui_base(self, config: TextureConfig, frame: int,
+                 rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """UI element texture: translucent black panel"""
+        img = Image.new('L', (config.width, config.height), 0)
         draw = ImageDraw.Draw(img)
         
-        palette = self._get_theme_palette(config.theme)
-        
         # Border
         border_width = 3
         draw.rectangle(
             [border_width, border_width, 
              config.width - border_width, config.height - border_width],
-            outline=palette['accent'], width=border_width
+            outline=_SLOT_INDEX['accent'], width=border_width
         )
         
-        return img
+        index = np.array(img)
+        return {'index': index, 'alpha': np.where(index > 0, 255, 180).astype(np.uint8)}
     
-    async def _generate_default(self, config: TextureConfig, frame: int) -> Image.Image:
-        """Fallback generator"""
-        img = Image.new('RGB', (config.width, config.height), (128, 128, 128))
-        return img
+    def _default_base(self, config: TextureConfig, frame: int,
+                      rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """Fallback: plain gray"""
+        return {'index': np.full((config.height, config.width), _GRAY, dtype=np.uint8)}
     
-    def _generate_perlin_noise(self, width: int, height: int, scale: float = 0.1) -> np.ndarray:
-        """Generate Perlin-like noise"""
-        # Simplified Perlin noise implementation
-        lin_x = np.linspace(0, scale * width, width, endpoint=False)
-        lin_y = np.linspace(0, scale * height, height, endpoint=False)
-        x, y = np.meshgrid(lin_x, lin_y)
-        
-        # Combine multiple octaves
-        noise = np.zeros((height, width))
-        amplitude = 1.0
-        frequency = 1.0
-        
-        for _ in range(4):  # 4 octaves
-            noise += amplitude * np.sin(x * frequency) * np.cos(y * frequency)
-            amplitude *= 0.5
-            frequency *= 2.0
+    def _generate_perlin_noise(self, width: int, height: int, scale: float = 0.1,
+                               seed: int = 0) -> np.ndarray:
+        """Generate seamlessly tileable fractal gradient noise in [0, 1]"""
+        return fractal_noise(width, height, scale=scale, seed=seed)
+    
+    def _resolve_palette(self, config: TextureConfig) -> Dict[str, tuple]:
+        """
+        Theme palette with any custom ``color_palette`` applied
         
-        # Normalize to 0-1
-        noise = (noise - noise.min()) / (noise.max() - noise.min())
-        return noise
+        Custom colours (hex or CSS names) replace the slots in PALETTE_SLOTS
+        order, so a shorter list keeps the theme's remaining colours.
+        """
+        palette = dict(self._get_theme_palette(config.theme))
+        custom = config.color_palette or []
+        if not isinstance(custom, list):
+            raise ValueError(f"color_palette must be a list of colors, not {custom!r}")
+        if len(custom) > len(PALETTE_SLOTS):
+            raise ValueError(f"color_palette takes at most {len(PALETTE_SLOTS)} colors: {', '.join(PALETTE_SLOTS)}")
+        for slot, color in zip(PALETTE_SLOTS, custom):
+            if not isinstance(color, str):
+                raise ValueError(f"Invalid palette color: {color!r}")
+            palette[slot] = ImageColor.getrgb(color)[:3]
+        return palette
     
     def _get_theme_palette(self, theme: str) -> Dict[str, tuple]:
         """Get color palette for theme"""
@@ -435,175 +3254,804 @@ class AdvancedTextureGenerator:
         }
         return palettes.get(theme, palettes['banana'])
     
-    async def _apply_post_processing(self, img: Image.Image, config: TextureConfig) -> Image.Image:
+    def _apply_post_processing(self, img: Image.Image, config: TextureConfig) -> Image.Image:
         """Apply post-processing effects"""
         # Sharpen for clarity
         img = img.filter(ImageFilter.SHARPEN)
         
         # Adjust contrast based on quality
-        quality_multiplier = Quality[config.quality].value / 256
         enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.0 + quality_multiplier * 0.2)
+        img = enhancer.enhance(self._contrast_factor(config))
         
         return img
     
-    async def _add_detail_layer(self, img: Image.Image, palette: Dict) -> Image.Image:
-        """Add fine detail to texture"""
-        detail = Image.new('RGBA', img.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(detail)
-        
-        # Add random detail marks
+    def _contrast_factor(self, config: TextureConfig) -> float:
+        quality_multiplier = Quality[config.quality].value / 256
+        return 1.0 + quality_multiplier * 0.2
+    
+    def _detail_marks(self, width: int, height: int,
+                      rng: np.random.Generator) -> List[Tuple[int, int, int, int]]:
+        """Random detail marks as (x, y, size, alpha)"""
+        marks = []
         for _ in range(20):
-            x = np.random.randint(0, img.width)
-            y = np.random.randint(0, img.height)
-            size = np.random.randint(2, 5)
-            alpha = np.random.randint(20, 60)
-            color = palette['accent'] + (alpha,)
-            draw.ellipse([x, y, x + size, y + size], fill=color)
-        
-        return Image.alpha_composite(img.convert('RGBA'), detail).convert('RGB')
-    
-    async def _add_weathering(self, img: Image.Image) -> Image.Image:
-        """Add weathering effects for realism"""
-        # Slight noise overlay
-        noise = np.random.randint(-10, 10, (img.height, img.width, 3), dtype=np.int16)
-        img_array = np.array(img, dtype=np.int16)
-        img_array = np.clip(img_array + noise, 0, 255).astype(np.uint8)
-        return Image.fromarray(img_array)
-    
-    async def _add_soft_shadow(self, img: Image.Image) -> Image.Image:
-        """Add soft shadow to sprite"""
-        shadow = Image.new('RGBA', img.size, (0, 0, 0, 0))
-        shadow.paste((0, 0, 0, 80), (0, 0, img.width, img.height))
-        shadow = shadow.filter(ImageFilter.GaussianBlur(radius=5))
-        
-        # Offset shadow
-        result = Image.new('RGBA', img.size, (0, 0, 0, 0))
-        result.paste(shadow, (2, 2), shadow)
-        result.paste(img, (0, 0), img)
+            x = int(rng.integers(0, width))
+            y = int(rng.integers(0, height))
+            size = int(rng.integers(2, 5))
+            alpha = int(rng.integers(20, 60))
+            marks.append((x, y, size, alpha))
+        return marks
+    
+    def _detail_alpha(self, shape: Tuple[int, int], marks: List[Tuple[int, int, int, int]],
+                      origin: Tuple[int, int] = (0, 0)) -> np.ndarray:
+        """Alpha of the detail layer over a window of the texture at ``origin``"""
+        height, width = shape
         
-        return result
+        # Marks overwrite each other on the detail layer, so only the last
+        # mark covering a pixel decides its alpha
+        detail_alpha = np.zeros((height, width), dtype=np.uint8)
+        
+        for x, y, size, alpha in marks:
+            mask = _detail_mark_mask(size)
+            x, y = x - origin[0], y - origin[1]
+            # Clip the mark to the window on every side
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + mask.shape[1], width), min(y + mask.shape[0], height)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            region = detail_alpha[y0:y1, x0:x1]
+            region[mask[y0 - y:y1 - y, x0 - x:x1 - x]] = alpha
+        return detail_alpha
     
-    async def _generate_normal_map(self, img: Image.Image) -> Image.Image:
-        """Generate normal map from diffuse"""
-        # Convert to grayscale
-        gray = img.convert('L')
-        gray_array = np.array(gray, dtype=np.float32) / 255.0
-        
-        # Calculate gradients
-        grad_x = np.gradient(gray_array, axis=1)
-        grad_y = np.gradient(gray_array, axis=0)
-        
-        # Construct normal vectors
-        normal_x = -grad_x
-        normal_y = -grad_y
-        normal_z = np.ones_like(gray_array)
-        
-        # Normalize
-        length = np.sqrt(normal_x**2 + normal_y**2 + normal_z**2)
-        normal_x /= length
-        normal_y /= length
-        normal_z /= length
-        
-        # Convert to RGB (0-255 range)
-        normal_map = np.stack([
-            ((normal_x + 1) * 0.5 * 255).astype(np.uint8),
-            ((normal_y + 1) * 0.5 * 255).astype(np.uint8),
-            ((normal_z + 1) * 0.5 * 255).astype(np.uint8)
-        ], axis=2)
-        
-        return Image.fromarray(normal_map)
-    
-    async def _generate_specular_map(self, img: Image.Image) -> Image.Image:
-        """Generate specular map"""
-        # Use brightness as specular intensity
-        gray = img.convert('L')
-        enhancer = ImageEnhance.Contrast(gray)
-        specular = enhancer.enhance(2.0)
-        return specular.convert('RGB')
-    
-    async def _generate_ao_map(self, img: Image.Image) -> Image.Image:
-        """Generate ambient occlusion map"""
-        # Simplified AO based on edge detection
-        edges = img.convert('L').filter(ImageFilter.FIND_EDGES)
-        edges_array = np.array(edges)
-        ao_array = 255 - edges_array  # Invert: dark where edges
-        return Image.fromarray(ao_array).convert('RGB')
-    
-    def _encode_images(self, images: List[Image.Image]) -> List[str]:
-        """Encode images to base64"""
-        encoded = []
-        for img in images:
-            buffer = io.BytesIO()
-            img.save(buffer, format='PNG')
-            encoded.append(base64.b64encode(buffer.getvalue()).decode('utf-8'))
-        return encoded
-    
-    async def _get_from_cache(self, cache_key: str) -> Optional[Dict]:
-        """Retrieve from cache"""
-        cache_file = self.cache_dir / f"{cache_key}.json"
-        if cache_file.exists():
-            try:
-                async with aiofiles.open(cache_file, 'r') as f:
-                    content = await f.read()
-                    return json.loads(content)
-            except Exception as e:
-                logger.warning(f"Cache read error: {e}")
-        return None
+    def _composite_detail(self, pixels: np.ndarray, detail_alpha: np.ndarray,
+                          palette: Dict) -> np.ndarray:
+        """Composite the accent-coloured detail layer onto opaque ``pixels``"""
+        # PIL's fixed-point alpha_composite arithmetic, so output is unchanged
+        covered = detail_alpha > 0
+        src_a = detail_alpha[covered][:, np.newaxis].astype(np.uint32)
+        coef1 = src_a * 255 * 255 * (1 << _PRECISION_BITS) // (src_a * 255 + 255 * (255 - src_a))
+        coef2 = 255 * (1 << _PRECISION_BITS) - coef1
+        accent = np.array(palette['accent'], dtype=np.uint32)
+        blended = accent * coef1 + pixels[covered].astype(np.uint32) * coef2
+        blended += 0x80 << _PRECISION_BITS
+        blended = ((blended >> 8) + blended) >> 8 >> _PRECISION_BITS
+        
+        pixels = pixels.copy()
+        pixels[covered] = blended.astype(np.uint8)
+        return pixels
+    
+    def _derive_maps(self, images: List[Image.Image], config: TextureConfig,
+                     timer: StageTimer) -> Dict[str, List[Image.Image]]:
+        """
+        Derive the requested normal, specular and AO maps of ``images``
+        
+        Luminance is computed once and every map works on the stacked
+        (frames, H, W) array, so a full PBR set costs little more than one map.
+        """
+        if not (config.enable_normal_map or config.enable_specular or config.enable_ao):
+            return {}
+        
+        with timer.stage('luminance'):
+            luma = self._luminance(images)
+        
+        maps = {}
+        if config.enable_normal_map:
+            with timer.stage('normal'):
+                maps['normal'] = self._generate_normal_map(luma)
+        if config.enable_specular:
+            with timer.stage('specular'):
+                maps['specular'] = self._generate_specular_map(luma)
+        if config.enable_ao:
+            with timer.stage('ao'):
+                maps['ao'] = self._generate_ao_map(luma)
+        
+        return {
+            name: [Image.fromarray(frame) for frame in stacked]
+            for name, stacked in maps.items()
+        }
+    
+    def _downsample(self, img: Image.Image) -> Image.Image:
+        """Halve with a 2x2 box filter, rounding odd sizes up"""
+        if img.mode == 'RGBA':
+            # Average premultiplied colour so transparent texels don't bleed into edges
+            return img.convert('RGBa').reduce(2).convert('RGBA')
+        return img.reduce(2)
     
-    async def _save_to_cache(self, cache_key: str, data: Dict):
+    def _luminance(self, images: List[Image.Image]) -> np.ndarray:
+        """Stacked 8-bit luminance, matching PIL's convert('L')"""
+        first = images[0]
+        if first.mode not in ('RGB', 'RGBA'):
+            return np.stack([np.asarray(img.convert('L')) for img in images])
+        
+        luma = np.empty((len(images), first.height, first.width), dtype=np.uint8)
+        acc = np.empty((first.height, first.width), dtype=np.uint32)
+        scratch = np.empty_like(acc)
+        for out, img in zip(luma, images):
+            rgb = np.asarray(img)
+            # ITU-R 601-2 weights in PIL's 16-bit fixed point
+            np.multiply(rgb[..., 0], 19595, out=acc, dtype=np.uint32)
+            acc += np.multiply(rgb[..., 1], 38470, out=scratch, dtype=np.uint32)
+            acc += np.multiply(rgb[..., 2], 7471, out=scratch, dtype=np.uint32)
+            acc += 0x8000
+            acc >>= 16
+            out[...] = acc
+        return luma
+    
+    def _generate_normal_map(self, luma: np.ndarray) -> np.ndarray:
+        """Generate normal maps from stacked luminance"""
+        gray = luma.astype(np.float32)
+        gray /= 255.0
+        
+        # Central differences inside, one-sided at the borders (np.gradient)
+        grad_x = np.zeros_like(gray)
+        grad_y = np.zeros_like(gray)
+        for grad, axis in ((grad_x, 2), (grad_y, 1)):
+            if gray.shape[axis] < 2:
+                continue
+            src = np.moveaxis(gray, axis, -1)
+            dst = np.moveaxis(grad, axis, -1)
+            np.subtract(src[..., 2:], src[..., :-2], out=dst[..., 1:-1])
+            dst[..., 1:-1] /= 2.0
+            np.subtract(src[..., 1], src[..., 0], out=dst[..., 0])
+            np.subtract(src[..., -1], src[..., -2], out=dst[..., -1])
+        
+        # Length of (-grad_x, -grad_y, 1), reusing gray as scratch
+        length = np.multiply(grad_x, grad_x, out=gray)
+        length += np.square(grad_y)
+        length += 1.0
+        np.sqrt(length, out=length)
+        
+        # Each component maps [-1, 1] to [0, 255]
+        normal_map = np.empty(luma.shape + (3,), dtype=np.uint8)
+        for channel, component in enumerate((grad_x, grad_y)):
+            component /= length
+            np.subtract(1.0, component, out=component)
+            component *= 0.5
+            component *= 255
+            normal_map[..., channel] = component
+        z = np.divide(1.0, length, out=length)
+        z += 1.0
+        z *= 0.5
+        z *= 255
+        normal_map[..., 2] = z
+        
+        return normal_map
+    
+    def _generate_specular_map(self, luma: np.ndarray,
+                               means: Optional[np.ndarray] = None) -> np.ndarray:
+        """Generate specular maps, around ``means`` (per frame) when given"""
+        # Use brightness as specular intensity, with contrast doubled around
+        # each frame's mean as ImageEnhance.Contrast(2.0) does
+        if means is None:
+            pixels = luma.shape[1] * luma.shape[2]
+            means = (luma.sum(axis=(1, 2), dtype=np.int64) / pixels + 0.5).astype(np.int16)
+        specular = luma.astype(np.int16)
+        specular *= 2
+        specular -= means[:, np.newaxis, np.newaxis]
+        np.clip(specular, 0, 255, out=specular)
+        return np.repeat(specular.astype(np.uint8)[..., np.newaxis], 3, axis=3)
+    
+    def _generate_ao_map(self, luma: np.ndarray) -> np.ndarray:
+        """Generate ambient occlusion maps"""
+        # Simplified AO based on edge detection: PIL's FIND_EDGES kernel
+        # (8 * center - neighbours), leaving the one-pixel border unfiltered
+        edges = luma.copy()
+        if luma.shape[1] >= 3 and luma.shape[2] >= 3:
+            src = luma.astype(np.int16)
+            acc = src[:, 1:-1, 1:-1] * 9
+            for dy in range(3):
+                for dx in range(3):
+                    acc -= src[:, dy:dy + luma.shape[1] - 2, dx:dx + luma.shape[2] - 2]
+            np.clip(acc, 0, 255, out=acc)
+            edges[:, 1:-1, 1:-1] = acc
+        ao = 255 - edges  # Invert: dark where edges
+        return np.repeat(ao[..., np.newaxis], 3, axis=3)
+    
+    def _encode_images(self, images: List[Image.Image], compression: str = 'png') -> List[bytes]:
+        """Encode images concurrently per ``compression`` (see parse_compression)"""
+        encoding = parse_compression(compression)
+        if len(images) == 1:
+            return [_encode_image(images[0], encoding)]
+        return list(_get_encode_pool().map(functools.partial(_encode_image, encoding=encoding), images))
+    
+    async def _get_from_cache(self, cache_key: str) -> Optional[TextureResult]:
+        """Retrieve from cache, dropping output of another generator version as a miss"""
+        if self.cache is None:
+            return None
+        try:
+            return await self.cache.get(cache_key, accept=_is_current)
+        except Exception as e:
+            logger.warning(f"Cache read error: {e}")
+            return None
+    
+    async def _save_to_cache(self, cache_key: str, result: TextureResult):
         """Save to cache"""
-        cache_file = self.cache_dir / f"{cache_key}.json"
+        if self.cache is None:
+            return
         try:
-            async with aiofiles.open(cache_file, 'w') as f:
-                await f.write(json.dumps(data))
+            await self.cache.put(cache_key, result)
         except Exception as e:
             logger.warning(f"Cache write error: {e}")
 
 
+# Generator used by executor worker processes (created on first job)
+_worker_generator: Optional[AdvancedTextureGenerator] = None
+
+
+def _get_worker_generator() -> AdvancedTextureGenerator:
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = AdvancedTextureGenerator(
+            cache_dir=None,
+            executor=GenerationExecutor(max_workers=0)
+        )
+    return _worker_generator
+
+
+def _run_frame_job(config: TextureConfig, start: int, stop: int, encode: bool = True,
+                   bases: Optional[List[bytes]] = None
+                   ) -> Tuple[List[Dict[str, Any]], List[Tuple[str, float]], Optional[List[bytes]]]:
+    """
+    Executor entry point: render a range of frames, returning them with stage timings
+    
+    Frames are recoloured from packed ``bases`` when given; otherwise the
+    freshly rendered bases are packed and returned for the cache, if the
+    type's bases are cached at all.
+    """
+    generator = _get_worker_generator()
+    timer = StageTimer()
+    new_bases = None
+    if bases is None:
+        unpacked = generator._render_bases(config, start, stop, timer)
+        if config.texture_type not in generator.UNCACHED_BASES:
+            new_bases = [_pack_base(base) for base in unpacked]
+    else:
+        unpacked = [_unpack_base(base) for base in bases]
+    rendered = generator._render_frames(config, start, stop, encode, timer, unpacked)
+    return rendered, timer.samples, new_bases
+
+
+def _run_map_job(config: TextureConfig, name: str,
+                 frames: List[bytes]) -> Tuple[List[bytes], List[Tuple[str, float]]]:
+    """Executor entry point: derive one auxiliary map from encoded diffuse frames"""
+    timer = StageTimer()
+    encoded = _get_worker_generator()._render_map(config, name, frames, timer)
+    return encoded, timer.samples
+
+
+def _run_tile_job(stage: str, config: TextureConfig, scratch: str,
+                  rects: List[Tuple[int, int, int, int]], *args) -> Tuple[List[Any], List[Tuple[str, float]]]:
+    """Executor entry point: run one pass of a tiled render (see _generate_tiles) over some tiles"""
+    timer = StageTimer()
+    render = getattr(_get_worker_generator(), f"_tile_{stage}")
+    results = [render(config, scratch, rect, *args, timer=timer) for rect in rects]
+    return results, timer.samples
+
+
+def _run_atlas_job(entries: List[List[Dict[str, Any]]], layout: Dict[str, Any],
+                   compression: str = 'png') -> Tuple[Dict[str, bytes], List[Tuple[str, float]]]:
+    """Executor entry point: pack frames into encoded atlas sheets"""
+    timer = StageTimer()
+    sheets = _get_worker_generator()._pack_atlas(entries, layout, timer, compression)
+    return sheets, timer.samples
+
+
+# Binary streaming response: a sequence of parts, each a big-endian uint32
+# header length, a UTF-8 JSON header, a big-endian uint32 payload length and
+# the payload. The first part carries metadata, then one part per map frame,
+# then a final 'end' (or 'error') part.
+STREAM_CONTENT_TYPE = 'application/x-texture-stream'
+
+# GET responses are addressed by config and generator version, so they never change
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Request fields that set a Schedule rather than the TextureConfig, and the
+# headers that set them otherwise
+SCHEDULE_FIELDS = {
+    'priority': 'X-Priority',
+    'deadline_ms': 'X-Deadline-Ms',
+    'degrade': 'X-Degrade'
+}
+
+
+def _stream_part_prefix(header: Dict[str, Any], payload_length: int = 0) -> bytes:
+    """Encode everything in a stream part that precedes its payload"""
+    encoded = _json_dumps(header)
+    return (
+        struct.pack('>I', len(encoded)) + encoded +
+        struct.pack('>I', payload_length)
+    )
+
+
 # Web Service
 class TextureService:
     """RESTful API for texture generation"""
     
-    def __init__(self):
-        self.generator = AdvancedTextureGenerator()
+    def __init__(self, cache_dir: str = "./texture_cache",
+                 max_workers: Optional[int] = None,
+                 max_queue: Optional[int] = None,
+                 queue_timeout: Optional[float] = 0.0,
+                 memory_cache_bytes: int = 256 * 1024 * 1024,
+                 disk_cache_bytes: int = 4 * 1024 * 1024 * 1024,
+                 cache_ttl: Optional[float] = None,
+                 preload_baked: bool = True,
+                 cache_backend: str = 'dir'):
+        executor = GenerationExecutor(
+            max_workers=max_workers,
+            max_queue=max_queue,
+            queue_timeout=queue_timeout
+        )
+        cache = TieredTextureCache(
+            cache_dir,
+            memory_bytes=memory_cache_bytes,
+            disk_bytes=disk_cache_bytes,
+            ttl=cache_ttl,
+            backend=cache_backend
+        )
+        self.metrics = ServiceMetrics()
+        self.generator = AdvancedTextureGenerator(executor=executor, cache=cache, metrics=self.metrics)
+        self.preloaded = 0
         self.app = web.Application()
+        if preload_baked:
+            self.app.on_startup.append(self._on_startup)
+        self.app.on_cleanup.append(self._on_cleanup)
         self._setup_routes()
     
     def _setup_routes(self):
         """Configure API routes"""
+        self.app.router.add_get('/api/generate', self.handle_generate_get)
         self.app.router.add_post('/api/generate', self.handle_generate)
+        self.app.router.add_post('/api/generate/batch', self.handle_generate_batch)
+        self.app.router.add_post('/api/atlas', self.handle_atlas)
+        self.app.router.add_get('/api/maps/{map}', self.handle_map)
         self.app.router.add_get('/api/stats', self.handle_stats)
+        self.app.router.add_get('/metrics', self.handle_metrics)
         self.app.router.add_get('/health', self.handle_health)
     
-    async def handle_generate(self, request: web.Request) -> web.Response:
+    async def handle_generate(self, request: web.Request) -> web.StreamResponse:
         """
         POST /api/generate
         Body: TextureConfig JSON
-        Returns: Generated texture data
+        Returns: Generated texture data, as JSON with base64 frames or, with
+        ``?format=binary`` or ``Accept: application/x-texture-stream``, as a
+        binary stream that sends each frame as soon as it is encoded.
+        With ``?lazy=1`` only diffuse frames are generated, and
+        ``lazy_maps`` holds a URL per enabled map that derives it on demand.
+        Scheduling fields are described in ``_schedule``.
         """
         try:
-            data = await request.json()
+            data = _json_loads(await request.read())
+            schedule = self._schedule(request, data)
             config = TextureConfig(**data)
+            self.generator.validate(config)
+        except (TypeError, ValueError) as e:
+            return _json_response({'error': str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"Generation error: {e}", exc_info=True)
+            return _json_response(
+                {'error': str(e)},
+                status=500
+            )
+        
+        return await self._generate_response(request, config, schedule=schedule)
+    
+    async def handle_generate_get(self, request: web.Request) -> web.StreamResponse:
+        """
+        GET /api/generate?texture_type=wall&width=256&height=256&...
+        Query: TextureConfig fields (see TextureConfig.from_query)
+        Returns: The same representations as POST, with a weak ETag and
+        long-lived Cache-Control. A matching If-None-Match gets 304 without
+        looking at the cache.
+        """
+        try:
+            config = TextureConfig.from_query(request.query)
+            self.generator.validate(config)
+            schedule = self._schedule(request)
+        except (TypeError, ValueError) as e:
+            return _json_response({'error': str(e)}, status=400)
+        
+        variants = [
+            variant for variant, wanted in (('lazy', self._wants_lazy(request)),
+                                            ('stream', self._wants_stream(request)))
+            if wanted
+        ]
+        headers = self._cache_headers(config.to_cache_key(), *variants)
+        if self._not_modified(request, headers):
+            return web.Response(status=304, headers=headers)
+        
+        return await self._generate_response(request, config, headers, schedule)
+    
+    async def handle_map(self, request: web.Request) -> web.StreamResponse:
+        """
+        GET /api/maps/{map}?texture_type=wall&width=256&height=256&...
+        Query: TextureConfig fields, as in the ``lazy_maps`` URLs
+        Returns: One auxiliary map (normal, specular or ao) of the config,
+        derived from its diffuse frames on first fetch and cached after.
+        Conditional requests and scheduling work as for GET /api/generate.
+        """
+        name = request.match_info['map']
+        if name not in AdvancedTextureGenerator.LAZY_MAPS:
+            return _json_response({'error': f"Unknown map: {name}"}, status=404)
+        try:
+            config = TextureConfig.from_query(request.query)
+            self.generator.validate(config)
+            key = self.generator.map_key(config, name)
+            schedule = self._schedule(request)
+        except (TypeError, ValueError) as e:
+            return _json_response({'error': str(e)}, status=400)
+        
+        headers = self._cache_headers(key)
+        if self._not_modified(request, headers):
+            return web.Response(status=304, headers=headers)
+        
+        extra = {}
+        try:
+            fitted = await self.generator.fit_deadline(config, schedule, key)
+        except DeadlineExceededError as e:
+            return _json_response({'error': str(e)}, status=503)
+        if fitted is not config:
+            extra['degraded_from'] = self._degraded_from(config)
+            headers = {'Cache-Control': 'no-store'}
+            config = fitted
+        
+        try:
+            with self.metrics.track_request():
+                result = await self.generator.generate_map(config, name, schedule)
+                return await self._send_json(request, result, ServiceMetrics.labels_for(config), headers, extra)
+        except ExecutorSaturatedError as e:
+            return _json_response(
+                {'error': str(e)},
+                status=429,
+                headers={'Retry-After': '1'}
+            )
+        except Exception as e:
+            logger.error(f"Map generation error: {e}", exc_info=True)
+            return _json_response(
+                {'error': str(e)},
+                status=500
+            )
+    
+    def _cache_headers(self, cache_key: str, *variants: str) -> Dict[str, str]:
+        """
+        Weak ETag for one representation of a cached output, plus caching policy
+        
+        The tag is weak because the bytes aren't fixed: metadata carries the
+        render's timestamp and encoder time, and mip levels (see
+        _save_mip_levels) are filtered rather than rendered.
+        """
+        etag = '-'.join([GENERATOR_VERSION, cache_key, *variants])
+        return {
+            'ETag': f'W/"{etag}"',
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL,
+            'Vary': 'Accept'
+        }
+    
+    def _not_modified(self, request: web.Request, headers: Dict[str, str]) -> bool:
+        # If-None-Match uses weak comparison, and '*' matches any version
+        etag = headers['ETag'].removeprefix('W/').strip('"')
+        return any(tag.value in (etag, '*') for tag in request.if_none_match or ())
+    
+    def _schedule(self, request: web.Request, data: Optional[Dict[str, Any]] = None) -> Schedule:
+        """
+        Scheduling of a request (see Schedule.parse)
+        
+        ``priority`` (interactive, normal or bulk), ``deadline_ms`` and
+        ``degrade`` are taken from ``data`` if present there, which leaves
+        the rest of it a TextureConfig. Otherwise they come from query
+        parameters or the headers in SCHEDULE_FIELDS.
+        """
+        values = {}
+        for name, header in SCHEDULE_FIELDS.items():
+            if data is not None and name in data:
+                values[name] = data.pop(name)
+            elif name in request.query:
+                values[name] = request.query[name]
+            elif header in request.headers:
+                values[name] = request.headers[header]
+        return Schedule.parse(**values)
+    
+    def _degraded_from(self, config: TextureConfig) -> Dict[str, Any]:
+        """What a response generated at a lower quality to meet its deadline was asked for"""
+        return {'quality': config.quality, 'width': config.width, 'height': config.height}
+    
+    async def _generate_response(self, request: web.Request, config: TextureConfig,
+                                 headers: Optional[Dict[str, str]] = None,
+                                 schedule: Optional[Schedule] = None) -> web.StreamResponse:
+        """Generate ``config`` and answer as JSON or a binary stream"""
+        schedule = schedule or Schedule()
+        extra = {}
+        try:
+            fitted = await self.generator.fit_deadline(config, schedule)
+        except DeadlineExceededError as e:
+            return _json_response({'error': str(e)}, status=503)
+        if fitted is not config:
+            extra['degraded_from'] = self._degraded_from(config)
+            # The ETag names the requested config, not this stand-in
+            headers = {'Cache-Control': 'no-store'}
+            config = fitted
+        
+        if self._wants_lazy(request):
+            try:
+                lazy_config = self.generator.lazy_diffuse_config(config)
+            except ValueError as e:
+                return _json_response({'error': str(e)}, status=400)
+            # Handles carry the original config, which pins the same seed
+            query = urlencode(config.to_query())
+            extra['lazy_maps'] = {
+                name: f"/api/maps/{name}?{query}"
+                for name in self.generator._map_names(config)[1:]
+            }
+            config = lazy_config
+        
+        try:
+            with self.metrics.track_request():
+                if self._wants_stream(request):
+                    return await self._stream_texture(request, config, headers, extra, schedule)
+                
+                result = await self.generator.generate(config, schedule)
+                
+                return await self._send_json(
+                    request, result, ServiceMetrics.labels_for(config), headers, extra
+                )
             
-            result = await self.generator.generate(config)
-            
-            return web.json_response(result)
-            
+        except ExecutorSaturatedError as e:
+            return _json_response(
+                {'error': str(e)},
+                status=429,
+                headers={'Retry-After': '1'}
+            )
         except Exception as e:
             logger.error(f"Generation error: {e}", exc_info=True)
-            return web.json_response(
+            return _json_response(
+                {'error': str(e)},
+                status=500
+            )
+    
+    async def handle_generate_batch(self, request: web.Request) -> web.StreamResponse:
+        """
+        POST /api/generate/batch
+        Body: {"configs": [TextureConfig JSON, ...]} or a bare list
+        Returns: NDJSON stream with one line per distinct config, in
+        completion order. Each line lists the request ``indices`` it answers
+        and carries either a ``result`` or an ``error`` with its ``status``.
+        A final line summarizes the batch. Configs may carry their own
+        scheduling fields (see ``_schedule``), and a result generated at a
+        lower quality to meet its deadline has ``degraded_from``.
+        """
+        try:
+            data = _json_loads(await request.read())
+            items = data['configs'] if isinstance(data, dict) else data
+            if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+                raise ValueError("configs must be a list of TextureConfig objects")
+        except Exception as e:
+            return _json_response({'error': str(e)}, status=400)
+        
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        summary = {'done': True, 'count': len(items), 'errors': 0}
+        
+        async def write_line(line: Dict[str, Any]):
+            if 'error' in line:
+                summary['errors'] += len(line['indices'])
+            await response.write(_json_dumps(line) + b'\n')
+        
+        # Identical configs are generated once and answered together, as
+        # urgently as the most urgent of them
+        groups: Dict[str, Tuple[TextureConfig, List[int]]] = {}
+        schedules: Dict[str, Schedule] = {}
+        for idx, item in enumerate(items):
+            try:
+                item = dict(item)
+                schedule = self._schedule(request, item)
+                config = TextureConfig(**item)
+                self.generator.validate(config)
+            except Exception as e:
+                await write_line({'indices': [idx], 'error': str(e), 'status': 400})
+                continue
+            key = config.to_cache_key()
+            groups.setdefault(key, (config, []))[1].append(idx)
+            schedules.setdefault(key, schedule).merge(schedule)
+        
+        # Cache hits go out straight away
+        misses = {}
+        for key, (config, indices) in groups.items():
+            cached = await self.generator.get_cached(config)
+            if cached is not None:
+                await write_line({'indices': indices, 'key': key, 'result': cached.to_dict()})
+            else:
+                misses[key] = (config, indices)
+        
+        # Misses fan out across the workers without flooding the queue
+        limit = asyncio.Semaphore(max(1, self.generator.executor.max_workers))
+        
+        async def generate(config: TextureConfig, schedule: Schedule) -> Tuple[TextureConfig, TextureResult]:
+            async with limit:
+                # Fitted once a worker is free, so waiting here counts against the deadline
+                fitted = await self.generator.fit_deadline(config, schedule)
+                return fitted, await self.generator.generate(fitted, schedule)
+        
+        tasks = {
+            asyncio.ensure_future(generate(config, schedules[key])): key
+            for key, (config, _) in misses.items()
+        }
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    key = tasks[task]
+                    config, indices = misses[key]
+                    line = {'indices': indices, 'key': key}
+                    try:
+                        fitted, result = task.result()
+                        line['result'] = result.to_dict()
+                        if fitted is not config:
+                            line['degraded_from'] = self._degraded_from(config)
+                    except ExecutorSaturatedError as e:
+                        line.update(error=str(e), status=429)
+                    except DeadlineExceededError as e:
+                        line.update(error=str(e), status=503)
+                    except Exception as e:
+                        line.update(error=str(e), status=500)
+                    await write_line(line)
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        await write_line(summary)
+        await response.write_eof()
+        return response
+    
+    async def handle_atlas(self, request: web.Request) -> web.Response:
+        """
+        POST /api/atlas
+        Body: {"configs": [TextureConfig JSON, ...], "padding": 1}
+        Returns: One sheet per map holding every frame of every config,
+        with frame UV rects in metadata.atlas. Scheduling fields (see
+        ``_schedule``) apply to every config, and ``degraded_from`` lists
+        the entries generated at a lower quality to meet the deadline.
+        """
+        try:
+            data = _json_loads(await request.read())
+            schedule = self._schedule(request, data)
+            configs = [TextureConfig(**item) for item in data['configs']]
+            for config in configs:
+                self.generator.validate(config)
+            # The sheet must fit too, before any entry is generated
+            _atlas_layout(configs, data.get('padding', 1))
+        except (KeyError, TypeError, ValueError) as e:
+            return _json_response({'error': str(e)}, status=400)
+        
+        # Each entry is fitted to the deadline on its own, as they generate in parallel
+        extra = {}
+        try:
+            fitted = [await self.generator.fit_deadline(config, schedule) for config in configs]
+        except DeadlineExceededError as e:
+            return _json_response({'error': str(e)}, status=503)
+        degraded = [
+            {'entry': idx, **self._degraded_from(config)}
+            for idx, (config, fitted_config) in enumerate(zip(configs, fitted))
+            if fitted_config is not config
+        ]
+        if degraded:
+            extra['degraded_from'] = degraded
+        
+        try:
+            with self.metrics.track_request():
+                result = await self.generator.generate_atlas(fitted, data.get('padding', 1), schedule)
+                
+                return await self._send_json(request, result, ('atlas', 'other'), extra=extra)
+            
+        except ExecutorSaturatedError as e:
+            return _json_response(
+                {'error': str(e)},
+                status=429,
+                headers={'Retry-After': '1'}
+            )
+        except Exception as e:
+            logger.error(f"Atlas error: {e}", exc_info=True)
+            return _json_response(
                 {'error': str(e)},
                 status=500
             )
     
+    async def _send_json(self, request: web.Request, result: TextureResult,
+                         labels: Tuple[str, str],
+                         headers: Optional[Dict[str, str]] = None,
+                         extra: Optional[Dict[str, Any]] = None) -> web.Response:
+        """Serialize and write a result here, so the write can be timed"""
+        started = time.perf_counter()
+        response = _json_response({**result.to_dict(), **(extra or {})}, headers=headers)
+        await response.prepare(request)
+        await response.write_eof()
+        self.metrics.observe_response_write(labels, 'json', time.perf_counter() - started)
+        return response
+    
+    def _wants_lazy(self, request: web.Request) -> bool:
+        return request.query.get('lazy', '').lower() in ('1', 'true', 'yes', 'on')
+    
+    def _wants_stream(self, request: web.Request) -> bool:
+        return (
+            request.query.get('format') == 'binary' or
+            STREAM_CONTENT_TYPE in request.headers.get('Accept', '')
+        )
+    
+    async def _stream_texture(self, request: web.Request, config: TextureConfig,
+                              headers: Optional[Dict[str, str]] = None,
+                              extra: Optional[Dict[str, Any]] = None,
+                              schedule: Optional[Schedule] = None) -> web.StreamResponse:
+        """Write frames to the client as they are produced"""
+        metadata, frames = await self.generator.open_stream(config, schedule)
+        content_type = parse_compression(config.compression).content_type
+        
+        response = web.StreamResponse(headers={**(headers or {}), 'Content-Type': STREAM_CONTENT_TYPE})
+        # Only time spent writing counts, not time waiting on frames
+        write_seconds = 0.0
+        
+        async def write(chunk: bytes):
+            nonlocal write_seconds
+            started = time.perf_counter()
+            await response.write(chunk)
+            write_seconds += time.perf_counter() - started
+        
+        await response.prepare(request)
+        await write(_stream_part_prefix({'part': 'metadata', 'metadata': metadata, **(extra or {})}))
+        
+        try:
+            async for name, idx, data in frames:
+                await write(_stream_part_prefix({
+                    'part': 'frame',
+                    'map': name,
+                    'frame': idx,
+                    'content_type': content_type
+                }, len(data)))
+                await write(data)
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error(f"Streaming error: {e}", exc_info=True)
+            await write(_stream_part_prefix({'part': 'error', 'error': str(e)}))
+        else:
+            await write(_stream_part_prefix({'part': 'end', 'encoding': metadata.get('encoding')}))
+        
+        await response.write_eof()
+        self.metrics.observe_response_write(ServiceMetrics.labels_for(config), 'binary', write_seconds)
+        return response
+    
     async def handle_stats(self, request: web.Request) -> web.Response:
         """GET /api/stats - Service statistics"""
-        return web.json_response(self.generator.stats)
+        return _json_response({
+            **self.generator.stats,
+            'preloaded': self.preloaded,
+            'executor': self.generator.executor.stats,
+            'scheduler': self.generator.executor.scheduler_stats(),
+            'cache': self.generator.cache.stats
+        })
+    
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """GET /metrics - Prometheus exposition"""
+        if not self.metrics.enabled:
+            return _json_response({'error': 'prometheus_client is not installed'}, status=503)
+        return web.Response(
+            body=self.metrics.render(),
+            headers={'Content-Type': METRICS_CONTENT_TYPE}
+        )
     
     async def handle_health(self, request: web.Request) -> web.Response:
         """GET /health - Health check"""
-        return web.json_response({'status': 'healthy'})
+        return _json_response({'status': 'healthy'})
+    
+    async def _on_startup(self, app: web.Application):
+        """Pull baked textures into memory so their first requests are lookups"""
+        cache = self.generator.cache
+        index = load_bake_index(cache.disk.root / BAKE_INDEX_NAME)
+        if index is None:
+            return
+        self.preloaded = await cache.preload(list(index['entries']))
+        logger.info(f"Preloaded {self.preloaded} of {len(index['entries'])} baked textures")
+    
+    async def _on_cleanup(self, app: web.Application):
+        """Stop worker processes and flush the cache when the app shuts down"""
+        self.generator.executor.shutdown()
+        await self.generator.cache.close()
     
     def run(self, host: str = '0.0.0.0', port: int = 8080):
         """Start the service"""
@@ -611,6 +4059,226 @@ class TextureService:
         web.run_app(self.app, host=host, port=port)
 
 
+# Baking: generate a manifest of configs ahead of deploy
+BAKE_INDEX_NAME = 'bake_index.json'
+
+
+def load_manifest(path: str) -> List[Tuple[Optional[str], TextureConfig]]:
+    """
+    Read a bake manifest
+    
+    The manifest is a JSON list of TextureConfig objects, or an object
+    with such a list under "textures". Entries may carry a "name", which
+    is recorded in the index next to the cache key.
+    """
+    with open(path, 'rb') as f:
+        data = _json_loads(f.read())
+    items = data['textures'] if isinstance(data, dict) else data
+    
+    entries = []
+    for idx, item in enumerate(items):
+        item = dict(item)
+        name = item.pop('name', None)
+        try:
+            entries.append((name, TextureConfig(**item)))
+        except TypeError as e:
+            raise ValueError(f"Manifest entry {idx}: {e}") from e
+    return entries
+
+
+def load_bake_index(path: Path) -> Optional[Dict[str, Any]]:
+    """Read a bake index, or None when it is missing or from another generator version"""
+    try:
+        index = json.loads(path.read_text())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable bake index {path}: {e}")
+        return None
+    if index.get('generator_version') != GENERATOR_VERSION:
+        logger.warning(f"Ignoring bake index {path} from generator version {index.get('generator_version')}")
+        return None
+    return index
+
+
+class TextureBaker:
+    """
+    Generates every texture of a manifest into the cache directory
+    
+    Entries already in the cache are skipped unless an older generator
+    version wrote them, so re-running after a manifest change only
+    renders what's new. The run ends by writing a
+    bake index that TextureService preloads at startup. With a bundle
+    directory, frames are also exported as plain PNG files for static
+    hosting, next to a copy of the index.
+    """
+    
+    def __init__(self, cache_dir: str = "./texture_cache",
+                 max_workers: Optional[int] = None,
+                 bundle_dir: Optional[str] = None,
+                 disk_cache_bytes: int = 4 * 1024 * 1024 * 1024,
+                 force: bool = False,
+                 cache_backend: str = 'dir'):
+        # Baking waits for workers instead of shedding load
+        executor = GenerationExecutor(max_workers=max_workers, queue_timeout=None)
+        # Baked results only need to reach disk
+        cache = TieredTextureCache(
+            cache_dir,
+            memory_bytes=0,
+            disk_bytes=disk_cache_bytes,
+            backend=cache_backend
+        )
+        self.generator = AdvancedTextureGenerator(executor=executor, cache=cache)
+        self.bundle_dir = Path(bundle_dir) if bundle_dir else None
+        self.force = force
+    
+    async def bake(self, entries: List[Tuple[Optional[str], TextureConfig]]) -> Dict[str, Any]:
+        """Bake ``entries`` and write the index; returns a summary of the run"""
+        cache = self.generator.cache
+        
+        # Identical configs are baked once
+        unique: Dict[str, Tuple[List[str], TextureConfig]] = {}
+        for name, config in entries:
+            names, _ = unique.setdefault(config.to_cache_key(), ([], config))
+            if name is not None:
+                names.append(name)
+        
+        summary = {'total': len(unique), 'baked': 0, 'skipped': 0, 'failed': 0}
+        index_entries: Dict[str, Dict[str, Any]] = {}
+        limit = asyncio.Semaphore(max(1, self.generator.executor.max_workers))
+        started = time.perf_counter()
+        
+        async def bake_one(key: str, config: TextureConfig):
+            async with limit:
+                entry_started = time.perf_counter()
+                try:
+                    result = None
+                    if self.force:
+                        await asyncio.to_thread(cache.disk.discard, key)
+                    else:
+                        result = await asyncio.to_thread(cache.disk.get, key)
+                    if result is not None and _is_current(result):
+                        outcome = 'skipped'
+                    else:
+                        # Replaces output of an older generator version, see _get_from_cache
+                        result = await self.generator.generate(config, Schedule(Priority.BULK))
+                        outcome = 'baked'
+                    if self.bundle_dir is not None:
+                        await asyncio.to_thread(self._export, key, result)
+                except Exception as e:
+                    outcome = 'failed'
+                    logger.error(f"Bake failed for {config.texture_type} {key[:12]}: {e}")
+                else:
+                    index_entries[key] = {
+                        'names': unique[key][0],
+                        'config': asdict(config)
+                    }
+                summary[outcome] += 1
+                done = summary['baked'] + summary['skipped'] + summary['failed']
+                logger.info(
+                    f"[{done}/{summary['total']}] {outcome} {config.texture_type} "
+                    f"{config.width}x{config.height} {key[:12]} "
+                    f"({time.perf_counter() - entry_started:.2f}s)"
+                )
+        
+        try:
+            await asyncio.gather(*[bake_one(key, config) for key, (_, config) in unique.items()])
+        finally:
+            self.generator.executor.shutdown()
+            await cache.close()
+        
+        index = {
+            'generator_version': GENERATOR_VERSION,
+            'created': datetime.now().isoformat(),
+            'entries': index_entries
+        }
+        self._write_index(cache.disk.root / BAKE_INDEX_NAME, index)
+        if self.bundle_dir is not None:
+            self._write_index(self.bundle_dir / BAKE_INDEX_NAME, index)
+        
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+        return summary
+    
+    def _export(self, key: str, result: TextureResult):
+        """Write one result into the bundle as ``<key>/<map>_<idx>.<ext>`` plus metadata"""
+        entry_dir = self.bundle_dir / key
+        if (entry_dir / 'metadata.json').exists() and not self.force:
+            return
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        compression = result.metadata.get('encoding', {}).get('compression', 'png')
+        extension = parse_compression(compression).extension
+        for name, frames in result.maps.items():
+            for idx, frame in enumerate(frames):
+                (entry_dir / f"{name}_{idx}.{extension}").write_bytes(frame)
+        # Metadata last, so a present file means a complete entry
+        (entry_dir / 'metadata.json').write_text(json.dumps(result.metadata))
+    
+    def _write_index(self, path: Path, index: Dict[str, Any]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(index, indent=2))
+        os.replace(tmp, path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Procedural texture generation service')
+    subparsers = parser.add_subparsers(dest='command')
+    
+    serve = subparsers.add_parser('serve', help='run the HTTP service (default)')
+    serve.add_argument('--host', default='0.0.0.0')
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument('--cache-dir', default='./texture_cache')
+    serve.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    serve.add_argument('--cache-backend', choices=sorted(CACHE_BACKENDS), default='dir')
+    serve.add_argument('--no-preload', action='store_true', help="don't preload baked textures")
+    
+    bake = subparsers.add_parser('bake', help='generate a manifest of textures ahead of time')
+    bake.add_argument('manifest', help='JSON list of TextureConfig objects')
+    bake.add_argument('--cache-dir', default='./texture_cache')
+    bake.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    bake.add_argument('--cache-backend', choices=sorted(CACHE_BACKENDS), default='dir')
+    bake.add_argument('--bundle', help='also export PNG files and the index into this directory')
+    bake.add_argument('--disk-cache-bytes', type=int, default=4 * 1024 * 1024 * 1024)
+    bake.add_argument('--force', action='store_true', help='regenerate entries that are already cached')
+    
+    args = parser.parse_args(argv)
+    configure_logging()
+    if install_uvloop():
+        logger.info("Using uvloop event loop")
+    
+    if args.command == 'bake':
+        try:
+            baker = TextureBaker(
+                cache_dir=args.cache_dir,
+                max_workers=args.workers,
+                bundle_dir=args.bundle,
+                disk_cache_bytes=args.disk_cache_bytes,
+                force=args.force,
+                cache_backend=args.cache_backend
+            )
+        except CacheLockedError as e:
+            logger.error(str(e))
+            return 1
+        summary = asyncio.run(baker.bake(load_manifest(args.manifest)))
+        logger.info(
+            f"Baked {summary['baked']}, skipped {summary['skipped']}, failed {summary['failed']} "
+            f"of {summary['total']} in {summary['seconds']}s"
+        )
+        return 1 if summary['failed'] else 0
+    
+    try:
+        service = TextureService(
+            cache_dir=getattr(args, 'cache_dir', './texture_cache'),
+            max_workers=getattr(args, 'workers', None),
+            preload_baked=not getattr(args, 'no_preload', False),
+            cache_backend=getattr(args, 'cache_backend', 'dir')
+        )
+    except CacheLockedError as e:
+        logger.error(str(e))
+        return 1
+    service.run(host=getattr(args, 'host', '0.0.0.0'), port=getattr(args, 'port', 8080))
+    return 0
+
+
 if __name__ == '__main__':
-    service = TextureService()
-    service.run()
+    raise SystemExit(main())